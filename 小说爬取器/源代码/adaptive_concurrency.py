@@ -0,0 +1,136 @@
+import asyncio
+import collections
+import time
+from retry_policy import SERVER, THROTTLED, TIMEOUT, NETWORK, classify
+
+# ---------- 自适应（AIMD）并发控制 ----------
+# 延迟和错误率正常时每轮窗口 +1（加性增；首次限流前按慢启动翻倍），遇到超时、429、5xx 立即减半（乘性减），
+# 这样不用手动调参，也能逼近站点能承受的最大吞吐
+
+OK = "ok"
+THROTTLE = "throttle"  # 超时 / 429 / 5xx / 连接失败：说明站点扛不住了
+ERROR = "error"  # 404、解析失败等与负载无关的错误，不影响窗口
+
+LATENCY_TOLERANCE = 3.0  # 平均延迟超过最低延迟的几倍就不再加窗口
+
+
+def classify_error(exc):
+    # 与重试策略共用一套异常分类，只区分“站点负载相关”和“其他”
+    return THROTTLE if classify(exc) in (THROTTLED, SERVER, TIMEOUT, NETWORK) else ERROR
+
+
+class AdaptiveLimiter:
+    """asyncio 用的并发窗口：acquire() 占一个名额，release() 时报告结果和耗时"""
+
+    def __init__(self, initial=16, minimum=2, maximum=200, on_change=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.on_change = on_change  # on_change(窗口大小, "increase"/"decrease")
+        self._latency = None  # 延迟的指数滑动平均
+        self._base_latency = None  # 观察到的最低延迟
+        self._last_cut = 0.0
+        self._slow_start = True  # 第一次被限流前每个成功 +1（指数增长），之后才转为加性增
+        self._waiters = collections.deque()  # [(future, rank, 序号)]
+        self._ranked = 0  # 其中带 rank 的个数
+        self._seq = 0
+
+    def current(self):
+        return int(self.window)
+
+    async def acquire(self, rank=None):
+        # 有空位且没人排队就直接占；否则排队等 release() 唤醒。
+        # rank() 返回排队顺序（越小越先），唤醒时才计算，排队期间顺序可以变；不传则按先来后到
+        if self.in_flight < int(self.window) and not self._waiters:
+            self.in_flight += 1
+            return
+        while True:
+            waiter = asyncio.get_running_loop().create_future()
+            self._seq += 1
+            entry = (waiter, rank, self._seq)
+            self._waiters.append(entry)
+            if rank is not None:
+                self._ranked += 1
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if entry in self._waiters:
+                    self._remove(entry)
+                elif waiter.done() and not waiter.cancelled():
+                    self._wake()  # 被唤醒后又被取消，把名额让给下一个
+                raise
+            if self.in_flight < int(self.window):
+                self.in_flight += 1
+                return
+
+    def release(self, outcome, latency=None):
+        self.in_flight -= 1
+        before = int(self.window)
+        if outcome == OK and latency is not None:
+            self._on_success(latency)
+        elif outcome == THROTTLE:
+            self._on_throttle()
+        after = int(self.window)
+        self._wake()
+        if after != before and self.on_change:
+            self.on_change(after, "increase" if after > before else "decrease")
+
+    def _remove(self, entry):
+        self._waiters.remove(entry)
+        if entry[1] is not None:
+            self._ranked -= 1
+
+    def _next_waiter(self):
+        if not self._ranked:
+            entry = self._waiters[0]
+        else:
+            # 有带优先级的等待者时挑 rank 最小的；没有 rank 的排在优先章节之后、按先来后到
+            entry = min(self._waiters, key=lambda e: (e[1]() if e[1] else (1, 0), e[2]))
+        self._remove(entry)
+        return entry[0]
+
+    def _wake(self):
+        free = int(self.window) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._next_waiter()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _on_success(self, latency):
+        self._latency = latency if self._latency is None else self._latency * 0.8 + latency * 0.2
+        if self._base_latency is None or latency < self._base_latency:
+            self._base_latency = latency
+        if self._latency <= self._base_latency * LATENCY_TOLERANCE:
+            step = 1 if self._slow_start else 1 / self.window
+            self.window = min(self.maximum, self.window + step)
+
+    def _on_throttle(self):
+        # 同一波失败只减一次，冷却时间取平均延迟（至少 1 秒）
+        now = time.monotonic()
+        if now - self._last_cut < max(self._latency or 0, 1.0):
+            return
+        self._last_cut = now
+        self._slow_start = False
+        self.window = max(self.minimum, self.window / 2)
+
+
+class AdaptiveDelay:
+    """单线程顺序爬取用：健康时逐步缩短请求间隔，被限流时间隔成倍拉长"""
+
+    def __init__(self, initial=0.1, minimum=0.0, maximum=30.0, step=0.01):
+        self.delay = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+
+    def record(self, outcome):
+        if outcome == OK:
+            self.delay = max(self.minimum, self.delay - self.step)
+        elif outcome == THROTTLE:
+            self.delay = min(self.maximum, max(self.delay * 2, 0.5))
+
+    def wait(self):
+        if self.delay > 0:
+            time.sleep(self.delay)
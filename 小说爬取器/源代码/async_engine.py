@@ -0,0 +1,134 @@
+import asyncio
+import contextlib
+import inspect
+from http_session import create_async_session
+from http_cache import CHAPTER_MAX_AGE, cached_fetch, fresh_cached
+from mirrors import mirror_pool
+from adaptive_concurrency import AdaptiveLimiter, ERROR, OK, classify_error
+from retry_policy import RetryCancelled, RetryPolicy
+from cancellation import cancel_on_stop
+
+# ---------- 基于 asyncio 的章节下载引擎 ----------
+# 用单个事件循环 + aiohttp 代替线程池，同时在途的请求数由 AIMD 控制器在 concurrency 以内自动调整
+
+DEFAULT_CONCURRENCY = 200  # 同时在途请求数的上限
+
+
+async def fetch_chapter(session, url, chapter_num, parse_func, limiter, policy=None, timeout=10, log_func=None, stop_flag=None,
+                        rank=None):
+    loop = asyncio.get_running_loop()
+    policy = policy or RetryPolicy()
+
+    async def attempt():
+        # 每次下载占一个并发名额，结束时把结果和耗时报告给 AIMD 控制器；rank 决定排队时谁先拿到名额
+        await limiter.acquire(rank)
+        outcome, latency = ERROR, None
+        try:
+            start = loop.time()
+            # 缓存命中不经过镜像池，免得把极短的延迟算进对冲阈值
+            body = fresh_cached(url, CHAPTER_MAX_AGE)
+            if body is None:
+                body = await mirror_pool.fetch_async(url, lambda mirror_url: cached_fetch(
+                    session, mirror_url, timeout=timeout, max_age=CHAPTER_MAX_AGE, cache_key=url))
+            outcome, latency = OK, loop.time() - start
+        except Exception as e:
+            outcome = classify_error(e)
+            raise
+        finally:
+            limiter.release(outcome, latency)
+        # 解析不占并发名额；parse_func 可以是协程（交给解析进程池），解析失败同样按策略重试
+        result = parse_func(body, chapter_num)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def on_retry(attempt_no, e, delay):
+        if log_func:
+            log_func(f"⚠️ 第{chapter_num}章 第 {attempt_no} 次尝试失败：{e}，{delay:.1f}s 后重试")
+
+    try:
+        return await policy.run_async(attempt, stop_flag=stop_flag, on_retry=on_retry, url=url)
+    except RetryCancelled:
+        if log_func:
+            log_func(f"⏹️ 停止爬取，跳过第{chapter_num}章")
+    except Exception as e:
+        if log_func:
+            log_func(f"❌ 第{chapter_num}章 放弃重试：{e}")
+    return None, None, None, None
+
+
+async def crawl_chapters(all_chapters, parse_func, headers, log_func, writer, progress_func=None,
+                         concurrency=DEFAULT_CONCURRENCY, policy=None, timeout=10, stop_flag=None,
+                         saved_func=None, limiter=None, session=None, reading=None):
+    """并发下载 all_chapters（[(idx, url), ...]），按顺序交给 writer 写盘，返回成功章节数
+
+    parse_func(body, idx) 返回 (raw_title, title, content, next_url)，也可以是返回它的协程；
+    saved_func(idx) 返回 (title, content) 时直接用已保存的内容，不再请求网络；
+    limiter 为 AdaptiveLimiter，在途请求数在 [minimum, concurrency] 之间自动调整；
+    policy 为 RetryPolicy，决定单章失败后是否重试、等多久；
+    传入 session 时多本书共用同一个连接池（由调用方负责关闭），否则按 concurrency 新建一个；
+    reading 为 ReadingSession 时阅读位置附近的章节插队，不受写入窗口限制
+    """
+    succeeded = 0
+    if limiter is None:
+        limiter = AdaptiveLimiter(maximum=concurrency)
+
+    shared = contextlib.nullcontext(session) if session is not None else None
+    async with shared or create_async_session(concurrency, headers) as session:
+        async def worker(idx, url):
+            # 先占写入窗口再占连接，乱序缓存的章节数不会超过 writer.capacity（加上阅读位置附近插队的几章）
+            await writer.reserve(idx, reading.is_priority if reading else None)
+            saved = saved_func(idx) if saved_func else None
+            if saved:
+                await writer.put(idx, *saved)
+                return idx, (None, saved[0], saved[1], None)
+            rank = (lambda: reading.rank(idx)) if reading else None
+            result = await fetch_chapter(session, url, idx, parse_func, limiter, policy, timeout, log_func, stop_flag,
+                                         rank)
+            _, title, content, _ = result
+            if content:
+                await writer.put(idx, title, content)
+            else:
+                await writer.skip(idx)
+            return idx, result
+
+        tasks = [asyncio.create_task(worker(idx, url)) for idx, url in all_chapters]
+        # 要停止时直接取消所有任务：排队的不再开始，在途的请求和重试等待当场中断
+        stopped = []
+        watcher = asyncio.create_task(cancel_on_stop(stop_flag, tasks, lambda: stopped.append(True))) if stop_flag else None
+        # 阅读位置变了：叫醒等在写入窗口外的章节，插队的章节马上开始排队
+        loop = asyncio.get_running_loop()
+        on_focus = lambda: loop.create_task(writer.wake())
+        if reading:
+            reading.subscribe(loop, on_focus)
+        try:
+            for count, next_done in enumerate(asyncio.as_completed(tasks), 1):
+                if stop_flag and stop_flag():
+                    next_done.close()
+                    break
+                try:
+                    idx, (raw_title, title, content, _) = await next_done
+                except asyncio.CancelledError:
+                    if stopped:
+                        break
+                    raise
+                except Exception as e:
+                    log_func(f"❌ 章节爬取失败：{e}")
+                    continue
+                if content:
+                    succeeded += 1
+                    if progress_func:
+                        progress_func(count)
+                    log_func(f"✅ 第 {idx} 章获取成功")
+                else:
+                    log_func(f"⚠️ 第 {idx} 章内容为空")
+        finally:
+            if reading:
+                reading.unsubscribe(loop, on_focus)
+            if watcher:
+                watcher.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return succeeded
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import re
+import time
+from http_session import configure_session, create_async_session
+from adaptive_concurrency import AdaptiveLimiter
+from async_engine import DEFAULT_CONCURRENCY
+from parse_pool import DEFAULT_BATCH_SIZE, DEFAULT_PARSE_WORKERS, ParsePool
+
+# ---------- 多本书批量下载队列 ----------
+# 任务清单每行一本：“书名,作者”（也可用制表符分隔，作者可省略，# 开头为注释）。
+# 同时下载 parallel 本书，所有书共用一个 aiohttp 连接池和一个 AIMD 并发窗口，
+# 总的在途请求数不超过 concurrency；每个任务记录自己的进度，最后输出汇总
+
+DEFAULT_PARALLEL = 3  # 同时下载的书数
+
+PENDING = "等待中"
+RUNNING = "下载中"
+DONE = "完成"
+FAILED = "失败"
+STOPPED = "已停止"
+
+
+class BookJob:
+    def __init__(self, book_name, author_name="", output_file=None):
+        self.book_name = book_name
+        self.author_name = author_name
+        self.output_file = output_file
+        self.status = PENDING
+        self.done = 0  # 已处理的章节数（含失败）
+        self.total = 0
+        self.message = ""
+        self.elapsed = 0.0
+
+    def describe(self):
+        author = f"（{self.author_name}）" if self.author_name else ""
+        progress = f"{self.done}/{self.total} 章" if self.total else "-"
+        return f"《{self.book_name}》{author} {self.status} {progress} {self.elapsed:.1f}s {self.message}".rstrip()
+
+
+def parse_jobs(lines):
+    jobs = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [p.strip() for p in re.split(r"[,，\t]", line, maxsplit=1)]
+        jobs.append(BookJob(parts[0], parts[1] if len(parts) > 1 else ""))
+    return jobs
+
+
+def load_jobs(path):
+    with open(path, encoding="utf-8") as f:
+        return parse_jobs(f)
+
+
+def _safe_name(text):
+    return re.sub(r'[\\/:*?"<>|]', "_", text)
+
+
+def assign_output_files(jobs, output_dir, suffix=".txt"):
+    """给没有指定输出文件的任务按书名分配文件，同名书加上作者区分；suffix 决定输出格式"""
+    used = set()
+    for job in jobs:
+        if job.output_file:
+            continue
+        name = _safe_name(job.book_name)
+        path = os.path.join(output_dir, f"{name}{suffix}")
+        if path in used and job.author_name:
+            path = os.path.join(output_dir, f"{name}_{_safe_name(job.author_name)}{suffix}")
+        n = 2
+        while path in used:
+            path = os.path.join(output_dir, f"{name}_{n}{suffix}")
+            n += 1
+        used.add(path)
+        job.output_file = path
+    return jobs
+
+
+async def run_batch(jobs, crawl_func, log_func, parallel=DEFAULT_PARALLEL, concurrency=DEFAULT_CONCURRENCY,
+                    stop_flag=None, on_update=None, on_window_change=None,
+                    parse_workers=DEFAULT_PARSE_WORKERS, parse_batch=DEFAULT_BATCH_SIZE, parser_backend=None):
+    """依次启动任务，最多 parallel 本同时进行，返回 jobs
+
+    crawl_func(job, log_func, progress_func, total_func, session=, limiter=, parser=) 是下载一本书的协程，
+    返回 (是否成功, 结束信息)；parser 为所有书共用的 ParsePool（parse_workers 为 0 时是 None）；
+    on_update(job) 在任务状态或进度变化时调用；parser_backend 为共用解析进程池的解析后端
+    """
+    slots = asyncio.Semaphore(parallel)
+    # 搜索、目录这些同步请求每本书同一时间只有一个，共享的 requests 连接池按同时下载的书数开
+    configure_session(parallel)
+    limiter = AdaptiveLimiter(maximum=concurrency, on_change=on_window_change)
+    parser = ParsePool(parse_workers, parse_batch, parser_backend) if parse_workers > 0 else None
+
+    def notify(job):
+        if on_update:
+            on_update(job)
+
+    async with create_async_session(concurrency) as session:
+        async def run_job(job):
+            async with slots:
+                if stop_flag and stop_flag():
+                    job.status = STOPPED
+                    notify(job)
+                    return
+                job.status = RUNNING
+                notify(job)
+                start = time.monotonic()
+
+                def progress(count):
+                    job.done = count
+                    notify(job)
+
+                def total(count):
+                    job.total = count
+                    notify(job)
+
+                try:
+                    ok, job.message = await crawl_func(
+                        job, lambda msg: log_func(f"[{job.book_name}] {msg}"), progress, total,
+                        session=session, limiter=limiter, parser=parser,
+                    )
+                    job.status = DONE if ok else (STOPPED if stop_flag and stop_flag() else FAILED)
+                except Exception as e:
+                    job.status, job.message = FAILED, str(e)
+                job.elapsed = time.monotonic() - start
+                notify(job)
+
+        try:
+            await asyncio.gather(*(run_job(job) for job in jobs))
+        finally:
+            if parser:
+                parser.close()
+    return jobs
+
+
+def summarize(jobs):
+    counts = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    head = "、".join(f"{status} {n} 本" for status, n in counts.items())
+    lines = [f"📦 批量下载结束：共 {len(jobs)} 本，{head}"]
+    lines += [f"  {job.describe()}" for job in jobs]
+    return "\n".join(lines)
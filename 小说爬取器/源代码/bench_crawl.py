@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from bench_site import BOOK_NAME, BenchSite
+
+# ---------- 整本下载基准 ----------
+# 在本机起一个替身站点（bench_site），分别用 main.py（逐章顺序）和 main0531.py（asyncio 并发）
+# 的下载线程爬完整本书，报告 章/秒、请求延迟 p50/p99、峰值内存和 CPU。
+# 每组设置在独立的子进程里跑（各自全新的缓存、连接池和内存统计），站点留在本进程
+# 用法：python bench_crawl.py [-n 章节数] [--latency 0.02] [-c 50,200] [--save 结果.json]
+#       python bench_crawl.py --baseline 上次结果.json   # 章/秒 比基线低太多时返回 1
+
+ENGINES = ("main", "main0531")
+# 比 metrics 默认桶更细的延迟桶（约 1.25 倍一档），p50/p99 估计误差在 25% 以内
+LATENCY_BUCKETS = tuple(round(0.001 * 1.25 ** i, 6) for i in range(50))
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def peak_rss_mb():
+    """本进程的峰值常驻内存（MB），拿不到时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # macOS 单位是字节
+    except ImportError:  # Windows 没有 resource
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def run_engine(engine, site_url, concurrency, rate, parse_workers=0):
+    """子进程里执行：用对应界面的下载线程爬完整本书，返回结果字典"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import metrics
+    import novel_core
+    from rate_limiter import rate_limiter
+
+    novel_core.base_url = site_url
+    # 默认不限速，测的是引擎本身；--rate 可以把限速也算进去
+    if rate:
+        rate_limiter.configure("127.0.0.1", rate)
+    else:
+        rate_limiter.configure("127.0.0.1", 1e9, 1e9)
+    metrics.FETCH_SECONDS.buckets = LATENCY_BUCKETS
+
+    if engine == "main":
+        import main
+        thread = main.CrawlerThread(BOOK_NAME, "no", "bench.txt")
+    else:
+        import main0531
+        thread = main0531.CrawlerThread(BOOK_NAME, "", "bench.txt", concurrency=concurrency, resume=False,
+                                        journal_path="bench_journal.db", parse_workers=parse_workers)
+    chapters = []
+    finished = []
+    thread.progress_signal.connect(chapters.append)
+    thread.finished_signal.connect(finished.append)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    thread.run()  # 直接在本线程执行，信号都是直接调用
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    rss = peak_rss_mb()
+    with open("bench.txt", encoding="utf-8") as f:
+        saved = sum(1 for line in f if line.startswith("第") and "基准章节" in line)
+    return {
+        "engine": engine,
+        "concurrency": concurrency if engine == "main0531" else 1,
+        "parse_workers": parse_workers if engine == "main0531" else 0,
+        "chapters": saved,
+        "seconds": round(elapsed, 3),
+        "chapters_per_sec": round(saved / elapsed, 2) if elapsed else 0.0,
+        "requests": metrics.REQUESTS.total(),
+        "p50_ms": round(metrics.FETCH_SECONDS.quantile(0.5) * 1000, 2),
+        "p99_ms": round(metrics.FETCH_SECONDS.quantile(0.99) * 1000, 2),
+        "peak_rss_mb": round(rss, 1) if rss is not None else None,
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(cpu / elapsed * 100, 1) if elapsed else 0.0,
+        "message": finished[-1] if finished else "",
+    }
+
+
+def run_case(engine, site, concurrency, parse_workers, rate, timeout):
+    """在全新的子进程和临时目录里跑一组设置"""
+    script = os.path.abspath(__file__)
+    with tempfile.TemporaryDirectory(prefix="bench_crawl_") as workdir:
+        cmd = [sys.executable, script, "--worker", engine, "--site", site.url,
+               "-c", str(concurrency), "-w", str(parse_workers), "--rate", str(rate)]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(script),
+                                                                       os.environ.get("PYTHONPATH")])))
+        proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True, encoding="utf-8",
+                              timeout=timeout)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"{engine} 基准进程异常退出（返回码 {proc.returncode}）：{proc.stderr.strip()[-2000:]}")
+
+
+def format_table(results):
+    header = f"{'引擎':<10}{'并发':>6}{'解析进程':>6}{'章节':>7}{'耗时s':>9}{'章/秒':>9}{'p50ms':>9}{'p99ms':>9}{'峰值MB':>9}{'CPU s':>8}{'CPU%':>7}"
+    lines = [header]
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] is not None else "-"
+        lines.append(f"{r['engine']:<10}{r['concurrency']:>6}{r.get('parse_workers', 0):>10}{r['chapters']:>7}{r['seconds']:>9.2f}"
+                     f"{r['chapters_per_sec']:>9.1f}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}{rss:>9}"
+                     f"{r['cpu_seconds']:>8.2f}{r['cpu_percent']:>7.1f}")
+    return "\n".join(lines)
+
+
+def compare(results, baseline, tolerance):
+    """和基线比较 章/秒，返回退步的说明列表"""
+    key = lambda r: (r["engine"], r["concurrency"], r.get("parse_workers", 0))
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get(key(r))
+        if not old or not old["chapters_per_sec"]:
+            continue
+        change = r["chapters_per_sec"] / old["chapters_per_sec"] - 1
+        line = f"{r['engine']} 并发 {r['concurrency']} 解析进程 {r.get('parse_workers', 0)}：{old['chapters_per_sec']:.1f} → {r['chapters_per_sec']:.1f} 章/秒（{change:+.0%}）"
+        if change < -tolerance:
+            regressions.append(line)
+        print(("❌ " if change < -tolerance else "✅ ") + line)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="小说爬取器整本下载基准（本地替身站点）")
+    parser.add_argument("-e", "--engines", default=",".join(ENGINES), help="要测的引擎，逗号分隔：main,main0531")
+    parser.add_argument("-c", "--concurrency", default="50,200", help="main0531 的并发数，逗号分隔可测多组")
+    parser.add_argument("-w", "--parse-workers", default="0", help="main0531 的解析进程数，逗号分隔可测多组")
+    parser.add_argument("-n", "--chapters", type=int, default=300, help="替身站点的章节数")
+    parser.add_argument("--latency", type=float, default=0.02, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.01, help="每个请求额外的随机延迟上限（秒）")
+    parser.add_argument("--size", type=int, default=8, help="章节页大小（KB）")
+    parser.add_argument("--rate", type=float, default=0, help="令牌桶速率（请求/秒），0 表示不限速")
+    parser.add_argument("--timeout", type=float, default=600, help="每组设置的超时（秒）")
+    parser.add_argument("--save", help="把结果写入 JSON 文件，可作为以后的基线")
+    parser.add_argument("--baseline", help="和之前保存的结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="章/秒 允许下降的比例")
+    parser.add_argument("--worker", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--site", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        concurrency = int(args.concurrency.split(",")[0])
+        parse_workers = int(args.parse_workers.split(",")[0])
+        result = run_engine(args.worker, args.site, concurrency, args.rate, parse_workers)
+        print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False))
+        return 0
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        print(f"未知的引擎：{', '.join(sorted(unknown))}，可选 {', '.join(ENGINES)}", file=sys.stderr)
+        return 2
+    cases = []
+    for engine in engines:
+        if engine == "main0531":
+            cases += [(engine, int(c), int(w)) for c in args.concurrency.split(",") if c.strip()
+                      for w in args.parse_workers.split(",") if w.strip()]
+        else:
+            cases.append((engine, 1, 0))
+
+    settings = {"chapters": args.chapters, "latency": args.latency, "jitter": args.jitter,
+                "size_kb": args.size, "rate": args.rate}
+    print(f"替身站点：{args.chapters} 章，每章 {args.size} KB，延迟 {args.latency * 1000:.0f} ms"
+          f" + 随机 0~{args.jitter * 1000:.0f} ms，{'不限速' if not args.rate else f'限速 {args.rate:g} 请求/秒'}")
+    results = []
+    with BenchSite(args.chapters, args.latency, args.jitter, args.size) as site:
+        for engine, concurrency, parse_workers in cases:
+            print(f"运行 {engine}（并发 {concurrency}，解析进程 {parse_workers}）……", flush=True)
+            result = run_case(engine, site, concurrency, parse_workers, args.rate, args.timeout)
+            if result["chapters"] != args.chapters:
+                print(f"⚠️ 只保存了 {result['chapters']}/{args.chapters} 章：{result['message']}")
+            results.append(result)
+
+    print(format_table(results))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print("⚠️ 基线的站点设置与本次不同，比较结果仅供参考")
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import sys
+import time
+from chapter_parser import BACKENDS, extract_chapter
+
+# ---------- 章节页解析微基准 ----------
+# 用一页结构与 www.00shu.la 相同的合成章节页，比较各解析后端的耗时，并确认输出一致
+# （content_tip 后面跟着正文，检查去掉提示时不会把前后两段连在一起）
+# 用法：python bench_parser.py [重复次数]
+
+
+def make_page(lines=120):
+    nav = "".join(f'<li><a href="/sort/{i}/">分类{i}</a></li>' for i in range(1, 30))
+    paragraphs = "<br/>".join(
+        f"&nbsp;&nbsp;&nbsp;&nbsp;第{i}段，他抬头看了一眼天色，心中暗道此事恐怕没有那么简单。" * 2
+        for i in range(lines)
+    )
+    html = f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>第一百二十三章 风起 - 测试小说</title>
+<script>var bookid = 1; var chapterid = 123;</script><style>#content {{ font-size: 18px; }}</style></head>
+<body><div id="wrapper"><div class="header"><ul class="nav">{nav}</ul></div>
+<div class="box_con"><div class="con_top"><a href="/">首页</a> &gt; <a href="/book/1/">测试小说</a></div>
+<div class="bookname"><h1>第一百二十三章 风起</h1>
+<div class="bottem1"><a href="/book/1/1122.html">上一章</a> &larr; <a href="/book/1/">章节目录</a> &rarr; <a href="/book/1/1124.html">下一章</a></div></div>
+<div id="content">{paragraphs}<div id="content_tip">请记住本书首发域名</div>本章未完，请翻页<!-- ad --><script>show_ad();</script></div>
+<div class="bottem2"><a href="/book/1/1122.html">上一章</a><a href="/book/1/">章节目录</a><a href="/book/1/1124.html">下一章</a></div>
+</div><div class="footer">{nav}</div></div></body></html>"""
+    return html.encode("utf-8")
+
+
+def bench(body, backend, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract_chapter(body, backend)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    body = make_page()
+
+    results = {backend: extract_chapter(body, backend) for backend in BACKENDS}
+    baseline = results["bs4"]
+    for backend, result in results.items():
+        print(f"{backend:>5} 输出与 bs4 一致：{result == baseline}")
+
+    timings = {backend: bench(body, backend, repeat) for backend in BACKENDS}
+    print(f"页面大小 {len(body) / 1024:.1f} KB，每个后端解析 {repeat} 次")
+    for backend, seconds in timings.items():
+        print(f"{backend:>5}: {seconds * 1000:.3f} ms/页，加速 {timings['bs4'] / seconds:.1f}x")
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ---------- 本地替身站点 ----------
+# 基准测试用：在本机起一个 HTTP 服务，搜索页、目录页、章节页的结构与 www.00shu.la 相同
+# （table.grid tr#nr、div#list dd a、div.bookname h1、div#content），
+# 每个请求的延迟和章节页大小可调，这样不用访问真实站点也能比较各个引擎的吞吐量
+
+BOOK_NAME = "基准测试之书"
+AUTHOR_NAME = "基准作者"
+BOOK_PATH = "/book/1/"
+FIRST_CHAPTER_ID = 1000
+
+
+def _page(title, body):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+            f'<script>var bookid = 1;</script></head><body><div id="wrapper">'
+            f'<div class="header"><a href="/">首页</a></div><div class="box_con">{body}</div>'
+            f'<div class="footer">本站所有小说均来自网络</div></div></body></html>').encode("utf-8")
+
+
+def search_page(base):
+    return _page(f"搜索结果 - {BOOK_NAME}", (
+        '<table class="grid"><tr><th>文章名称</th><th>最新章节</th><th>作者</th><th>更新</th></tr>'
+        f'<tr id="nr"><td class="odd"><a href="{base}{BOOK_PATH}">{BOOK_NAME}</a></td>'
+        f'<td class="even"><a href="{BOOK_PATH}">最新章节</a></td>'
+        f'<td class="odd">{AUTHOR_NAME}</td><td class="even">2024-01-01</td></tr></table>'
+    ))
+
+
+def catalog_page(chapters):
+    items = "".join(
+        f'<dd><a href="{BOOK_PATH}{FIRST_CHAPTER_ID + i}.html">第{i}章 基准章节{i}</a></dd>'
+        for i in range(1, chapters + 1)
+    )
+    return _page(BOOK_NAME, f'<div id="info"><h1>{BOOK_NAME}</h1></div><div id="list"><dl>{items}</dl></div>')
+
+
+def chapter_page(index, chapters, size_kb):
+    line = f"&nbsp;&nbsp;&nbsp;&nbsp;第{index}章的正文，他抬头看了一眼天色，心中暗道此事恐怕没有那么简单。"
+    # 每行约 120 字节，按目标大小重复
+    lines = max(1, size_kb * 1024 // len(line.encode("utf-8")))
+    content = "<br/>".join([line] * lines)
+    prev_href = f"{BOOK_PATH}{FIRST_CHAPTER_ID + index - 1}.html" if index > 1 else BOOK_PATH
+    # 最后一章的“下一章”指回目录页，和真实站点一样
+    next_href = f"{BOOK_PATH}{FIRST_CHAPTER_ID + index + 1}.html" if index < chapters else BOOK_PATH
+    nav = (f'<a href="{prev_href}">上一章</a> &larr; <a href="{BOOK_PATH}">章节目录</a> &rarr; '
+           f'<a href="{next_href}">下一章</a>')
+    return _page(f"第{index}章 基准章节{index}", (
+        f'<div class="bookname"><h1>第{index}章 基准章节{index}</h1><div class="bottem1">{nav}</div></div>'
+        f'<div id="content">{content}<div id="content_tip">请记住本书首发域名</div></div>'
+        f'<div class="bottem2">{nav}</div>'
+    ))
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 高并发时连接不被拒绝
+
+
+class BenchSite:
+    """with BenchSite(chapters=300, latency=0.02) as site: ... site.url 是站点地址"""
+
+    def __init__(self, chapters=300, latency=0.02, jitter=0.0, size_kb=8, port=0):
+        self.chapters = chapters
+        self.latency = latency  # 每个请求固定延迟（秒）
+        self.jitter = jitter  # 额外的随机延迟上限（秒）
+        self.size_kb = size_kb  # 章节页大小
+        self.port = port
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _body(self, path):
+        if path.startswith("/modules/article/search.php"):
+            return search_page(self.url)
+        if path == BOOK_PATH:
+            return catalog_page(self.chapters)
+        if path.startswith(BOOK_PATH) and path.endswith(".html"):
+            try:
+                index = int(path[len(BOOK_PATH):-len(".html")]) - FIRST_CHAPTER_ID
+            except ValueError:
+                return None
+            if 1 <= index <= self.chapters:
+                return chapter_page(index, self.chapters, self.size_kb)
+        return None
+
+    def page(self, path):
+        # 页面内容固定，生成一次后缓存，服务端不成为瓶颈
+        with self._lock:
+            self.requests += 1
+            if path not in self._pages:
+                self._pages[path] = self._body(path)
+            return self._pages[path]
+
+    def start(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 保持连接，和真实站点一样复用连接
+            # 响应头和正文一次发出，避免 Nagle + 延迟确认给每个请求平白加几十毫秒
+            disable_nagle_algorithm = True
+            wbufsize = 64 * 1024
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                path = parts.path
+                if path.startswith("/modules/article/search.php") and not parse_qs(parts.query).get("q"):
+                    path = None
+                body = site.page(path) if path else None
+                delay = site.latency + (random.uniform(0, site.jitter) if site.jitter else 0.0)
+                if delay:
+                    time.sleep(delay)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _Server(("127.0.0.1", self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    import sys
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    with BenchSite(port=port) as site:
+        print(f"替身站点已启动：{site.url}（Ctrl+C 退出）")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,172 @@
+import collections
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# ---------- 本地书目索引 ----------
+# 把搜索结果里见过的书（书名、作者、URL）存进 SQLite，启动时在内存里建“字符二元组 → 书”的倒排索引。
+# 查询时先在本地找书名（给了作者时还有作者）规范化后完全相同的书，唯一命中才不再请求站点的搜索页；
+# 只是相近的书（续集、分卷、差一两个字的长书名）照样走远程搜索，搜到的结果再补进索引。
+# 远程候选的打分用二元组重合度（Dice 系数），替代 difflib
+
+DEFAULT_INDEX_PATH = "book_index.db"
+TITLE_WEIGHT = 0.7  # 与原来的 difflib 打分权重一致
+AUTHOR_WEIGHT = 0.3
+
+_PUNCTUATION = re.compile(r"[\s\W_]+")
+
+
+def normalize(text):
+    """全角转半角、转小写、去掉空白和标点"""
+    return _PUNCTUATION.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def ngrams(text):
+    # 两端加边界符，单字书名也有二元组，而且开头结尾相同的书名得分更高
+    text = f"\x02{normalize(text)}\x03"
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def similarity(a, b):
+    """两个字符串的二元组 Dice 系数，0~1"""
+    grams_a, grams_b = ngrams(a), ngrams(b)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def match_score(book_name, author_name, title, author):
+    """书名和作者一起打分；不知道作者（空或 no）时只看书名"""
+    title_score = similarity(book_name, title)
+    if author_name in ("", "no"):
+        return title_score
+    return title_score * TITLE_WEIGHT + similarity(author_name, author) * AUTHOR_WEIGHT
+
+
+class BookIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS books (
+                url     TEXT PRIMARY KEY,
+                title   TEXT NOT NULL,
+                author  TEXT NOT NULL,
+                seen_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self._books = []  # 书的编号 -> {"title", "author", "url"}
+        self._ids = {}  # url -> 编号
+        self._grams = []  # 编号 -> 书名二元组数
+        self._postings = collections.defaultdict(set)  # 二元组 -> 编号集合
+        for url, title, author in self.conn.execute("SELECT url, title, author FROM books"):
+            self._index(title, author, url)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _index(self, title, author, url):
+        book = {"title": title, "author": author, "url": url}
+        book_id = self._ids.get(url)
+        if book_id is not None:
+            old = self._books[book_id]
+            if old["title"] == title:
+                old["author"] = author
+                return
+            for gram in ngrams(old["title"]):
+                self._postings[gram].discard(book_id)
+            self._books[book_id] = book
+        else:
+            book_id = self._ids[url] = len(self._books)
+            self._books.append(book)
+            self._grams.append(0)
+        grams = ngrams(title)
+        self._grams[book_id] = len(grams)
+        for gram in grams:
+            self._postings[gram].add(book_id)
+
+    def add_many(self, books):
+        """books: [{"title", "author", "url"}, ...]，同一 URL 以最新的为准"""
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO books (url, title, author, seen_at) VALUES (?, ?, ?, ?)",
+                [(b["url"], b["title"], b["author"], now) for b in books],
+            )
+            self.conn.commit()
+            for b in books:
+                self._index(b["title"], b["author"], b["url"])
+
+    def search(self, book_name, author_name="", limit=5, min_score=0.0):
+        """返回 [(相似度, 书), ...]，按相似度从高到低，只要不低于 min_score 的"""
+        grams = ngrams(book_name)
+        with_author = author_name not in ("", "no")
+        with self._lock:
+            # 只给和书名至少有一个二元组重合的书打分，不用遍历整个书目
+            overlap = collections.Counter()
+            for gram in grams:
+                overlap.update(self._postings.get(gram, ()))
+            titles = sorted(
+                ((2 * shared / (len(grams) + self._grams[book_id]), book_id) for book_id, shared in overlap.items()),
+                reverse=True,
+            )
+            scored = []
+            for title_score, book_id in titles:
+                # 按书名分数从高到低，作者再怎么像也追不上已选结果时就停下
+                best_possible = title_score * TITLE_WEIGHT + AUTHOR_WEIGHT if with_author else title_score
+                if best_possible < min_score or (len(scored) >= limit and best_possible <= scored[limit - 1][0]):
+                    break
+                book = self._books[book_id]
+                score = (title_score * TITLE_WEIGHT + similarity(author_name, book["author"]) * AUTHOR_WEIGHT
+                         if with_author else title_score)
+                if score >= min_score:
+                    scored.append((score, dict(book)))
+                    scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:limit]
+
+    def lookup(self, book_name, author_name=""):
+        """本地有且只有一本书名（给了作者时还有作者）规范化后完全相同的书时返回 (1.0, 书)，否则返回 None"""
+        title, author = normalize(book_name), normalize(author_name)
+        with_author = author_name not in ("", "no")
+        # 书名二元组完全相同的才可能一样，再逐个比对规范化后的字符串
+        matches = [book for _, book in self.search(book_name, limit=20, min_score=1.0)
+                   if normalize(book["title"]) == title and (not with_author or normalize(book["author"]) == author)]
+        hit = (1.0, matches[0]) if len(matches) == 1 else None
+        with self._lock:
+            self.stats["hits" if hit else "misses"] += 1
+        return hit
+
+    def forget(self, url):
+        """书的地址失效时从索引里删掉"""
+        with self._lock:
+            self.conn.execute("DELETE FROM books WHERE url = ?", (url,))
+            self.conn.commit()
+            book_id = self._ids.pop(url, None)
+            if book_id is not None:
+                for gram in ngrams(self._books[book_id]["title"]):
+                    self._postings[gram].discard(book_id)
+
+    def summary(self):
+        s = self.stats
+        return f"📇 本地书目：收录 {len(self)} 本，本地命中 {s['hits']} 次，远程搜索 {s['misses']} 次"
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_book_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BookIndex()
+        return _index
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from retry_policy import RetryCancelled
+
+# ---------- 及时停止 ----------
+# stop_flag 只是一个“是否要停”的函数，光靠它只能在每次尝试之间检查。这里的工具把等待变成可中断的：
+# 同步请求放进守护线程，调用方每 STOP_POLL_INTERVAL 秒看一次 stop_flag，要停就直接放弃等待
+# （那个请求在后台自己结束，结果丢掉）；asyncio 里则由一个巡检任务发现停止后取消所有下载任务，
+# 在途的 aiohttp 请求随任务一起中断。停止后最多 STOP_POLL_INTERVAL 秒就能返回
+
+STOP_POLL_INTERVAL = 0.1
+
+
+def call_abortable(func, stop_flag, *args):
+    """在守护线程里执行 func(*args) 并等待结果；stop_flag() 为真时抛出 RetryCancelled，不再等它"""
+    if stop_flag is None:
+        return func(*args)
+    done = threading.Event()
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func(*args)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True).start()
+    while not done.wait(STOP_POLL_INTERVAL):
+        if stop_flag():
+            raise RetryCancelled()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+async def run_abortable(func, stop_flag, *args):
+    """asyncio 版：同步函数放进守护线程执行（不用 asyncio.to_thread，事件循环关闭时不必等它结束）"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(method, value):
+        if not future.done():
+            method(value)
+
+    def target():
+        try:
+            result = func(*args)
+        except BaseException as e:
+            method, value = future.set_exception, e
+        else:
+            method, value = future.set_result, result
+        try:
+            loop.call_soon_threadsafe(deliver, method, value)
+        except RuntimeError:
+            pass  # 已经停止、事件循环也关了，结果直接丢掉
+
+    threading.Thread(target=target, daemon=True).start()
+    while True:
+        done, _ = await asyncio.wait([future], timeout=STOP_POLL_INTERVAL)
+        if done:
+            return future.result()
+        if stop_flag and stop_flag():
+            future.cancel()
+            raise RetryCancelled()
+
+
+async def cancel_on_stop(stop_flag, tasks, on_stop=None):
+    """巡检任务：stop_flag() 为真时取消 tasks 里还没完成的任务"""
+    while not stop_flag():
+        await asyncio.sleep(STOP_POLL_INTERVAL)
+    if on_stop:
+        on_stop()
+    for task in tasks:
+        task.cancel()
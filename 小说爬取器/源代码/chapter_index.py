@@ -0,0 +1,175 @@
+import mmap
+import os
+import struct
+import threading
+from chapter_numbering import extract_chapter_number
+
+# ---------- 章节偏移索引和随机读取 ----------
+# 写 .txt 的同时在旁边追加一个 .idx：每章 16 字节（章节序号、字节偏移、字节长度），先写正文再写索引，
+# 所以索引里的每一条在 .txt 里一定有数据。ChapterReader 把 .txt 映射进内存，按索引直接切出任意一章
+# 或一段连续章节，不用从头扫描、也不用把整个文件读进来；文件还在下载时调用 refresh() 就能读到新写入的章节。
+# 没有索引（旧文件）或索引和 .txt 对不上时，按“标题\n\n正文\n\n”的格式扫描一遍 .txt 重建
+
+INDEX_SUFFIX = ".idx"
+_MAGIC = b"NVIDX01\n"
+_ENTRY = struct.Struct("<IQI")  # 章节序号、偏移、长度
+
+
+def index_path(output_file):
+    return output_file + INDEX_SUFFIX
+
+
+def read_index(path, start=0):
+    """读出 [(章节序号, 偏移, 长度), ...]；start 为已读到的位置，用于只读新追加的部分
+
+    返回 (条目, 读到的位置)，文件不存在或不是索引文件时返回 (None, 0)
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                return None, 0
+            f.seek(max(start, len(_MAGIC)))
+            data = f.read()
+    except OSError:
+        return None, 0
+    usable = len(data) - len(data) % _ENTRY.size  # 末尾可能有写了一半的条目
+    return list(_ENTRY.iter_unpack(data[:usable])), max(start, len(_MAGIC)) + usable
+
+
+def scan_chapters(output_file):
+    """扫描 .txt 得到 [(章节序号, 偏移, 长度), ...]；标题里认不出序号的章节按上一章加一"""
+    entries = []
+    if not os.path.exists(output_file) or not os.path.getsize(output_file):
+        return entries
+    with open(output_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        pos, number = 0, 0
+        while pos < len(data):
+            title_end = data.find(b"\n\n", pos)
+            content_end = data.find(b"\n\n", title_end + 2) if title_end >= 0 else -1
+            end = len(data) if content_end < 0 else content_end + 2
+            title = data[pos:title_end if title_end >= 0 else end].decode("utf-8", "replace").strip()
+            if title:
+                found = extract_chapter_number(title)
+                number = found if found is not None and found > number else number + 1
+                entries.append((number, pos, end - pos))
+            pos = end
+    return entries
+
+
+def write_index(output_file, entries):
+    """整个重写 output_file 的索引（先写临时文件再替换）"""
+    path = index_path(output_file)
+    with open(path + ".tmp", "wb") as f:
+        f.write(_MAGIC)
+        f.write(b"".join(_ENTRY.pack(*e) for e in entries))
+    os.replace(path + ".tmp", path)
+
+
+def _end(entries):
+    return max((offset + length for _, offset, length in entries), default=0)
+
+
+class ChapterIndexWriter:
+    """追加写 .idx；打开时索引和 .txt 对不上（旧文件没有索引、上次只写了一半）就先按 .txt 重建"""
+
+    def __init__(self, output_file):
+        self.path = index_path(output_file)
+        size = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+        entries, _ = read_index(self.path)
+        if entries is None or _end(entries) != size:
+            write_index(output_file, scan_chapters(output_file))
+        self._file = open(self.path, "ab")
+
+    def add(self, entries):
+        """entries: [(章节序号, 偏移, 长度), ...]，对应的正文要先写进 .txt 并 flush"""
+        self._file.write(b"".join(_ENTRY.pack(*e) for e in entries))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ChapterReader:
+    """只读打开一本已保存（或正在下载）的小说，按章节序号随机读取，可在多个线程里同时使用"""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.path = index_path(output_file)
+        self._lock = threading.Lock()
+        self._file = open(output_file, "rb")
+        self._size = 0
+        # (内存映射, {章节序号: (偏移, 长度)}) 作为一个整体替换，读的线程不会拿到对不上的两半
+        self._view = (b"", {})
+        self._read_to = 0  # 索引文件已经读到的位置
+        self._index_size = 0
+        self.refresh()
+
+    def refresh(self):
+        """重新映射 .txt 并载入索引里新追加的章节；索引文件变短（被重建过）时整个重新载入"""
+        with self._lock:
+            size = os.fstat(self._file.fileno()).st_size
+            try:
+                index_size = os.path.getsize(self.path)
+            except OSError:
+                index_size = 0
+            data, chapters = self._view
+            if size == self._size and index_size == self._index_size and index_size:
+                return len(chapters)
+            # 索引变短说明被重建过，.txt 变短说明被重新下载覆盖了，都要整个重新载入
+            if index_size < self._index_size or size < self._size or not index_size:
+                chapters, self._read_to = {}, 0
+            entries, read_to = read_index(self.path, self._read_to)
+            if entries is None:
+                entries, read_to, chapters = scan_chapters(self.output_file), 0, {}
+            chapters = dict(chapters)
+            for number, offset, length in entries:
+                if offset + length <= size:
+                    chapters[number] = (offset, length)
+            if size != self._size:
+                # 旧的映射不主动关闭，别的线程可能还在读，没有引用后自动释放
+                data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            self._view = (data, chapters)
+            self._size, self._read_to, self._index_size = size, read_to, index_size
+        return len(chapters)
+
+    def __len__(self):
+        return len(self._view[1])
+
+    def __contains__(self, number):
+        return number in self._view[1]
+
+    def numbers(self):
+        """已保存的章节序号，从小到大"""
+        return sorted(self._view[1])
+
+    def raw(self, number):
+        """第 number 章的原始字节（标题\n\n正文\n\n），没有这一章时抛出 KeyError"""
+        data, chapters = self._view
+        offset, length = chapters[number]
+        return data[offset:offset + length]
+
+    def chapter(self, number):
+        """返回 (标题, 正文)"""
+        title, _, content = self.raw(number).decode("utf-8").partition("\n\n")
+        return title, content.rstrip("\n")
+
+    def read_range(self, first, last):
+        """第 first 到 last 章（含）的原始字节，中间缺的章节跳过；在文件里连续时只切一次"""
+        data, chapters = self._view
+        spans = [chapters[n] for n in range(first, last + 1) if n in chapters]
+        if not spans:
+            return b""
+        if all(a[0] + a[1] == b[0] for a, b in zip(spans, spans[1:])):
+            return data[spans[0][0]:spans[-1][0] + spans[-1][1]]
+        return b"".join(data[offset:offset + length] for offset, length in spans)
+
+    def close(self):
+        with self._lock:
+            self._view = (b"", {})
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,118 @@
+import re
+
+# ---------- 章节编号 ----------
+# 中文数字与整数互转（支持 十/百/千/万/亿、零/〇/两），正则预编译，
+# 中文序号表按需一次性扩展；renumber_catalog 对整本目录做一次编号，并把序号表一次建到目录的最大序号
+
+_CN_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4,
+              '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_CN_UNITS = {'十': 10, '百': 100, '千': 1000}
+_CN_SECTIONS = {'万': 10 ** 4, '亿': 10 ** 8}
+_NUMS = '零一二三四五六七八九'
+_UNIT_NAMES = ['', '十', '百', '千']
+
+_NUMERAL = r"[零〇一二两三四五六七八九十百千万亿\d]+"
+_TITLE_HEAD = re.compile(rf"^(第)?({_NUMERAL})章")
+
+_numeral_table = ['零']  # _numeral_table[n] == int_to_chinese(n)
+
+
+def _section_to_chinese(num):
+    # 0 < num < 10000
+    result = ''
+    str_num = str(num)
+    length = len(str_num)
+    for i, digit_char in enumerate(str_num):
+        digit = int(digit_char)
+        pos = length - i - 1
+        if digit != 0:
+            result += _NUMS[digit] + _UNIT_NAMES[pos]
+        elif i < length - 1 and str_num[i + 1] != '0':
+            result += _NUMS[0]
+    return result
+
+
+def _to_chinese(num):
+    if num == 0:
+        return _NUMS[0]
+    parts = []
+    for big, name in ((10 ** 8, '亿'), (10 ** 4, '万')):
+        if num >= big:
+            parts.append(_to_chinese(num // big) + name)
+            num %= big
+            if 0 < num < big // 10:
+                parts.append(_NUMS[0])
+    if num:
+        parts.append(_section_to_chinese(num))
+    result = ''.join(parts)
+    # 十一 而不是 一十一
+    if result.startswith('一十'):
+        result = result[1:]
+    return result
+
+
+def numeral_table(size):
+    """返回覆盖 0..size 的中文序号表，表只会增长，不会重复计算"""
+    for n in range(len(_numeral_table), size + 1):
+        _numeral_table.append(_to_chinese(n))
+    return _numeral_table
+
+
+def int_to_chinese(num):
+    if num < len(_numeral_table):
+        return _numeral_table[num]
+    if num <= 100000:
+        return numeral_table(num)[num]
+    return _to_chinese(num)
+
+
+def chinese_num_to_int(cn):
+    if not cn:
+        return None
+    if cn.isdigit():
+        return int(cn)
+    # 一二三 这种逐位写法
+    if all(ch in _CN_DIGITS for ch in cn):
+        return int(''.join(str(_CN_DIGITS[ch]) for ch in cn))
+
+    total = 0
+    section = 0
+    digit = None
+    for ch in cn:
+        if ch in _CN_DIGITS:
+            digit = _CN_DIGITS[ch]
+        elif ch in _CN_UNITS:
+            section += (1 if digit is None else digit) * _CN_UNITS[ch]
+            digit = None
+        elif ch in _CN_SECTIONS:
+            section += digit or 0
+            total += (section or 1) * _CN_SECTIONS[ch]
+            section = 0
+            digit = None
+        else:
+            return None
+    return total + section + (digit or 0)
+
+
+def extract_chapter_number(title):
+    m = _TITLE_HEAD.match(title)
+    if m:
+        return chinese_num_to_int(m.group(2))
+    return None
+
+
+def process_title(raw_title, chapter_num):
+    """把标题开头的 第X章 / X章 统一改写成 第{中文序号}章，没有序号就补上"""
+    chapter_num_cn = int_to_chinese(chapter_num)
+    m = _TITLE_HEAD.match(raw_title)
+    if m and chinese_num_to_int(m.group(2)) is not None:
+        return f"第{chapter_num_cn}章" + raw_title[m.end():]
+    return f"第{chapter_num_cn}章 {raw_title}"
+
+
+def renumber_catalog(catalog):
+    """catalog: [(idx, url, 目录中的章节名), ...]，返回 {idx: 最终标题}"""
+    if not catalog:
+        return {}
+    numeral_table(max(idx for idx, _, _ in catalog))
+    return {idx: process_title(name, idx) for idx, _, name in catalog if name}
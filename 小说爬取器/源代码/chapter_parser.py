@@ -0,0 +1,112 @@
+import time
+import lxml.html
+from bs4 import BeautifulSoup
+from metrics import PARSE_SECONDS
+
+# ---------- 章节页解析 ----------
+# 章节页只需要三样东西：div.bookname h1、div#content（去掉 div#content_tip）和“下一章”链接。
+# 默认用 lxml 直接从响应字节解析（C 实现，比 html.parser 快一个数量级），
+# 保留原来的 BeautifulSoup 实现作为备选，两者输出一致
+
+BACKENDS = ("lxml", "bs4")
+_backend = "lxml"
+
+_LXML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+_SKIP_TAGS = {"script", "style"}
+
+
+def set_backend(name):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"未知的解析后端：{name}，可选 {', '.join(BACKENDS)}")
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+def _texts(element, skip_id=None):
+    # 与 BeautifulSoup.get_text 一致：跳过注释和 script/style 里的文字，保留标签后的尾随文字。
+    # id 为 skip_id 的子树整个跳过，但它后面的尾随文字照常保留（drop_tree() 会把尾随文字并进前一段）
+    if element.text and element.tag not in _SKIP_TAGS:
+        yield element.text
+    for child in element:
+        if isinstance(child.tag, str) and not (skip_id and child.get("id") == skip_id):
+            yield from _texts(child, skip_id)
+        if child.tail:
+            yield child.tail
+
+
+def _extract_lxml(body):
+    if not body.strip():
+        return "无标题", "未获取到正文内容", None
+    tree = lxml.html.fromstring(body, parser=_LXML_PARSER)
+
+    title_tags = tree.xpath('//div[contains(concat(" ", normalize-space(@class), " "), " bookname ")]//h1')
+    raw_title = "".join(t.strip() for t in _texts(title_tags[0])) if title_tags else "无标题"
+
+    content_tags = tree.xpath('//div[@id="content"]')
+    if content_tags:
+        content = "\n".join(t.strip() for t in _texts(content_tags[0], "content_tip") if t.strip())
+    else:
+        content = "未获取到正文内容"
+
+    next_hrefs = tree.xpath('//a[.="下一章"]/@href')
+    next_href = next_hrefs[0] or None if next_hrefs else None
+
+    return raw_title, content, next_href
+
+
+def _extract_bs4(body):
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    soup = BeautifulSoup(body, 'html.parser')
+
+    title_tag = soup.select_one("div.bookname h1")
+    raw_title = title_tag.get_text(strip=True) if title_tag else "无标题"
+
+    content_tag = soup.find("div", id="content")
+    if content_tag:
+        for tip in content_tag.select("div#content_tip"):
+            tip.extract()
+        content = content_tag.get_text("\n", strip=True)
+    else:
+        content = "未获取到正文内容"
+
+    next_tag = soup.find("a", string="下一章")
+    next_href = next_tag["href"] if next_tag and next_tag.get("href") else None
+
+    return raw_title, content, next_href
+
+
+def _extract(body, backend):
+    if backend == "lxml":
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return _extract_lxml(body)
+    return _extract_bs4(body)
+
+
+def extract_chapter(body, backend=None):
+    """body 为响应字节（或已解码的字符串），返回 (raw_title, content, next_href)"""
+    backend = backend or _backend
+    with PARSE_SECONDS.time(backend=backend):
+        return _extract(body, backend)
+
+
+def extract_many(bodies, backend):
+    """在解析进程里批量解析，返回 [(结果或异常, 耗时秒数), ...]
+
+    子进程里的指标不会回到主进程，所以把耗时带回去由主进程记录；
+    异常换成 ValueError，保证能跨进程传回
+    """
+    results = []
+    for body in bodies:
+        start = time.perf_counter()
+        try:
+            result = _extract(body, backend)
+        except Exception as e:
+            result = ValueError(f"{type(e).__name__}: {e}")
+        results.append((result, time.perf_counter() - start))
+    return results
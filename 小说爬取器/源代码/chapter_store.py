@@ -0,0 +1,230 @@
+import re
+import sqlite3
+import threading
+import time
+from chapter_index import write_index
+from metrics import WRITE_SECONDS
+from novel_update import save_meta
+
+# ---------- 本地书库：章节存进 SQLite，FTS5 全文检索 ----------
+# 可选的输出目标：每章（书、序号、标题、正文、来源URL）写进 novel_library.db，
+# 正文建 FTS5 索引（trigram 分词，中文按任意三字子串匹配），整个书库的全文搜索在毫秒级返回。
+# 同一个库也是离线副本：重新导出 .txt 不用联网，再次下载同一本书时库里已有的章节直接取用
+
+DEFAULT_LIBRARY = "novel_library.db"
+SNIPPET_TOKENS = 24  # 搜索结果摘要的长度（trigram 分词下约等于字数）
+MIN_TERM_LENGTH = 3  # trigram 索引能匹配的最短关键词，更短的用 LIKE 过滤
+
+
+def _fts_query(terms):
+    # 每个关键词按短语匹配，空格分隔表示“都要包含”；引号转义后不会被当成 FTS5 语法
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_pattern(term):
+    return "%" + re.sub(r"([\\%_])", r"\\\1", term) + "%"
+
+
+def _snippet(content, terms, width=SNIPPET_TOKENS):
+    """LIKE 扫描没有 snippet()，自己截取第一个关键词附近的一段"""
+    pos = min((content.find(t) for t in terms if t in content), default=0)
+    start = max(0, pos - width // 2)
+    text = content[start:start + width]
+    for term in terms:
+        text = text.replace(term, f"【{term}】")
+    return ("…" if start else "") + text + ("…" if start + width < len(content) else "")
+
+
+class ChapterStore:
+    def __init__(self, path=DEFAULT_LIBRARY):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS books (
+                book_url   TEXT PRIMARY KEY,
+                title      TEXT NOT NULL,
+                author     TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chapters (
+                id       INTEGER PRIMARY KEY,
+                book_url TEXT NOT NULL,
+                idx      INTEGER NOT NULL,
+                url      TEXT NOT NULL,
+                title    TEXT NOT NULL,
+                content  TEXT NOT NULL,
+                UNIQUE (book_url, idx)
+            );
+        """)
+        self.tokenizer = self._create_index()
+        self.conn.commit()
+
+    def _create_index(self):
+        # 全文索引只存倒排表，正文仍在 chapters 里（external content），触发器保持两边一致
+        for tokenizer in ("trigram", "unicode61"):  # trigram 需要 SQLite 3.34+
+            try:
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS chapters_fts USING fts5("
+                    f"title, content, content='chapters', content_rowid='id', tokenize='{tokenizer}')"
+                )
+                break
+            except sqlite3.OperationalError:
+                continue
+        self.conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS chapters_ai AFTER INSERT ON chapters BEGIN
+                INSERT INTO chapters_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chapters_ad AFTER DELETE ON chapters BEGIN
+                INSERT INTO chapters_fts (chapters_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chapters_au AFTER UPDATE ON chapters BEGIN
+                INSERT INTO chapters_fts (chapters_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+                INSERT INTO chapters_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+        """)
+        sql = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chapters_fts'").fetchone()[0]
+        return "trigram" if "trigram" in sql else "unicode61"
+
+    # ---------- 写入 ----------
+    def add_book(self, book_url, title, author=""):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO books (book_url, title, author, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (book_url) DO UPDATE SET title = excluded.title, author = excluded.author, "
+                "updated_at = excluded.updated_at",
+                (book_url, title, author, time.time()),
+            )
+            self.conn.commit()
+
+    def record(self, book_url, rows):
+        """rows: [(idx, url, title, content), ...]，一批一次提交；同一章再次写入时覆盖"""
+        with self._lock, WRITE_SECONDS.time(stage="library"):
+            self.conn.executemany(
+                "INSERT INTO chapters (book_url, idx, url, title, content) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (book_url, idx) DO UPDATE SET url = excluded.url, title = excluded.title, "
+                "content = excluded.content",
+                [(book_url, idx, url, title, content) for idx, url, title, content in rows],
+            )
+            self.conn.execute("UPDATE books SET updated_at = ? WHERE book_url = ?", (time.time(), book_url))
+            self.conn.commit()
+
+    def forget(self, book_url):
+        with self._lock:
+            self.conn.execute("DELETE FROM chapters WHERE book_url = ?", (book_url,))
+            self.conn.execute("DELETE FROM books WHERE book_url = ?", (book_url,))
+            self.conn.commit()
+
+    # ---------- 读取（接口与 ChapterJournal 相同，可直接用于断点续爬） ----------
+    def completed(self, book_url):
+        """返回 {idx: url}，表示库里已有的章节"""
+        with self._lock:
+            rows = self.conn.execute("SELECT idx, url FROM chapters WHERE book_url = ?", (book_url,))
+            return dict(rows.fetchall())
+
+    def load(self, book_url, idx):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT title, content FROM chapters WHERE book_url = ? AND idx = ?", (book_url, idx)
+            ).fetchone()
+
+    def books(self):
+        """[{"book_url", "title", "author", "chapters", "updated_at"}, ...]，最近更新的在前"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT b.book_url, b.title, b.author, COUNT(c.id), b.updated_at
+                FROM books b LEFT JOIN chapters c ON c.book_url = b.book_url
+                GROUP BY b.book_url ORDER BY b.updated_at DESC
+            """).fetchall()
+        keys = ("book_url", "title", "author", "chapters", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def find_book(self, name):
+        """按书名或书籍URL找书，书名优先完全相同，其次包含"""
+        books = self.books()
+        for match in (lambda b: name in (b["book_url"], b["title"]), lambda b: name in b["title"]):
+            found = [b for b in books if match(b)]
+            if found:
+                return found[0]
+        return None
+
+    # ---------- 全文搜索 ----------
+    def search(self, query, book_url=None, limit=20):
+        """在整个书库（或某本书）里搜索，返回 [{"book", "book_url", "idx", "title", "url", "snippet"}, ...]
+
+        关键词之间用空格分隔，章节要同时包含所有关键词；FTS5 按相关度排序，LIKE 扫描按书和章节顺序
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        where, params = "", []
+        if book_url:
+            where, params = " AND c.book_url = ?", [book_url]
+        # trigram 索引匹配不了一两个字的关键词：它们改用 LIKE 在索引筛出的章节里过滤，全是短词时只能整表扫描
+        short = [t for t in terms if len(t) < MIN_TERM_LENGTH] if self.tokenizer == "trigram" else []
+        indexed = [t for t in terms if t not in short]
+        for term in short:
+            where += " AND c.content LIKE ? ESCAPE '\\'"
+            params.append(_like_pattern(term))
+        if not indexed:
+            return self._search_like(short, where, params, limit)
+        sql = f"""
+            SELECT b.title, c.book_url, c.idx, c.title, c.url,
+                   snippet(chapters_fts, 1, '【', '】', '…', {SNIPPET_TOKENS})
+            FROM chapters_fts JOIN chapters c ON c.id = chapters_fts.rowid
+            LEFT JOIN books b ON b.book_url = c.book_url
+            WHERE chapters_fts MATCH ?{where}
+            ORDER BY rank LIMIT ?
+        """
+        with self._lock:
+            rows = self.conn.execute(sql, [_fts_query(indexed)] + params + [limit]).fetchall()
+        return [self._hit(*row) for row in rows]
+
+    def _search_like(self, terms, where, params, limit):
+        sql = f"""
+            SELECT b.title, c.book_url, c.idx, c.title, c.url, c.content
+            FROM chapters c LEFT JOIN books b ON b.book_url = c.book_url
+            WHERE 1{where}
+            ORDER BY c.book_url, c.idx LIMIT ?
+        """
+        with self._lock:
+            rows = self.conn.execute(sql, params + [limit]).fetchall()
+        return [self._hit(*row[:5], _snippet(row[5], terms)) for row in rows]
+
+    @staticmethod
+    def _hit(book, book_url, idx, title, url, snippet):
+        return {"book": book or book_url, "book_url": book_url, "idx": idx, "title": title, "url": url,
+                "snippet": snippet.replace("\n", " ")}
+
+    # ---------- 离线导出 ----------
+    def export(self, book_url, output_file):
+        """按章节顺序把整本书写成 .txt（格式与在线下载相同，并写好章节索引和增量更新用的 meta），返回章数"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT idx, url, title, content FROM chapters WHERE book_url = ? ORDER BY idx", (book_url,)
+            ).fetchall()
+        entries = []
+        with WRITE_SECONDS.time(stage="write"), open(output_file, "wb") as f:
+            for idx, _, title, content in rows:
+                data = f"{title}\n\n{content}\n\n".encode("utf-8")
+                entries.append((idx, f.tell(), len(data)))
+                f.write(data)
+        write_index(output_file, entries)
+        if rows:
+            save_meta(output_file, book_url, rows[-1][0], rows[-1][1])
+        return len(rows)
+
+    def summary(self):
+        with self._lock:
+            books, chapters = self.conn.execute(
+                "SELECT (SELECT COUNT(*) FROM books), (SELECT COUNT(*) FROM chapters)"
+            ).fetchone()
+        return f"📚 本地书库：{books} 本书，{chapters} 章（{self.path}）"
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,73 @@
+import sqlite3
+import zlib
+
+# ---------- 断点续爬日志 ----------
+# 以 (书籍URL, 章节序号) 为键记录已完成的章节：标题、来源URL、在输出文件中的偏移/长度，
+# 以及压缩后的正文。重启时只需下载缺失的章节，已完成的章节直接从日志重建 .txt
+
+DEFAULT_JOURNAL = "crawl_journal.db"
+
+
+class ChapterJournal:
+    def __init__(self, path=DEFAULT_JOURNAL):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chapters (
+                book_url TEXT NOT NULL,
+                idx      INTEGER NOT NULL,
+                url      TEXT NOT NULL,
+                title    TEXT NOT NULL,
+                offset   INTEGER NOT NULL,
+                length   INTEGER NOT NULL,
+                content  BLOB NOT NULL,
+                PRIMARY KEY (book_url, idx)
+            )
+        """)
+        self.conn.commit()
+
+    def completed(self, book_url):
+        """返回 {idx: url}，表示该书已完成的章节"""
+        rows = self.conn.execute(
+            "SELECT idx, url FROM chapters WHERE book_url = ?", (book_url,)
+        )
+        return dict(rows.fetchall())
+
+    def load(self, book_url, idx):
+        row = self.conn.execute(
+            "SELECT title, content FROM chapters WHERE book_url = ? AND idx = ?", (book_url, idx)
+        ).fetchone()
+        if row is None:
+            return None
+        title, content = row
+        return title, zlib.decompress(content).decode("utf-8")
+
+    def record(self, book_url, rows):
+        """rows: [(idx, url, title, content, offset, length), ...]，一批一次提交；
+        offset 为 -1 表示章节已下载但还没写进输出文件（停止时排在缺口后面）"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO chapters (book_url, idx, url, title, offset, length, content) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (book_url, idx, url, title, offset, length, zlib.compress(content.encode("utf-8")))
+                for idx, url, title, content, offset, length in rows
+            ],
+        )
+        self.conn.commit()
+
+    def forget(self, book_url):
+        self.conn.execute("DELETE FROM chapters WHERE book_url = ?", (book_url,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def split_resumable(journal, book_url, all_chapters):
+    """把目录分成 (可从日志恢复的章节序号集合, 需要下载的章节)；目录里 URL 变了的章节重新下载"""
+    done = journal.completed(book_url)
+    saved = {idx for idx, url in all_chapters if done.get(idx) == url}
+    missing = [(idx, url) for idx, url in all_chapters if idx not in saved]
+    return saved, missing
@@ -0,0 +1,209 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+import aiohttp
+from http_session import get_session
+from metrics import track_request
+from retry_policy import classify
+
+# ---------- 本地 HTTP 响应缓存 ----------
+# 以 URL 为键保存响应头和正文；再次请求时带上 If-None-Match / If-Modified-Since 做条件请求，
+# 服务器回 304 就直接用本地内容。缓存总大小超过上限时按最近最少使用（LRU）淘汰。
+# 写入攒成一批再提交（COMMIT_EVERY 次或 COMMIT_INTERVAL 秒），异步引擎里每章不再各自提交一次、阻塞事件循环
+
+DEFAULT_CACHE_PATH = "http_cache.db"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CHAPTER_MAX_AGE = 24 * 3600  # 章节发布后基本不变，一天内直接用缓存不再校验
+CATALOG_MAX_AGE = 0  # 目录页会更新，每次都校验
+COMMIT_EVERY = 200  # 攒够这么多次写入提交一次
+COMMIT_INTERVAL = 1.0  # 或者距上次提交超过这么多秒
+
+
+class HttpCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url         TEXT PRIMARY KEY,
+                headers     TEXT NOT NULL,
+                body        BLOB NOT NULL,
+                size        INTEGER NOT NULL,
+                stored_at   REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats = {"fresh": 0, "revalidated": 0, "misses": 0, "evicted": 0}
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def lookup(self, url):
+        """返回 (headers, body, stored_at) 或 None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT headers, body, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        headers, body, stored_at = row
+        return json.loads(headers), bytes(body), stored_at
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is None:
+            return headers
+        cached_headers = entry[0]
+        if cached_headers.get("etag"):
+            headers["If-None-Match"] = cached_headers["etag"]
+        if cached_headers.get("last-modified"):
+            headers["If-Modified-Since"] = cached_headers["last-modified"]
+        return headers
+
+    def store(self, url, headers, body):
+        keep = {k.lower(): v for k, v in headers.items() if k.lower() in ("etag", "last-modified", "content-type")}
+        now = time.time()
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (url, headers, body, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, json.dumps(keep), body, len(body), now, now),
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self.stats["misses"] += 1
+            self._evict()
+            self._written()
+
+    def touch(self, url, revalidated=False):
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self.conn.execute(
+                    "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url)
+                )
+                self.stats["revalidated"] += 1
+            else:
+                self.conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+                self.stats["fresh"] += 1
+            self._written()
+
+    def _written(self):
+        # 调用方已持有 _lock
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY or time.monotonic() - self._last_commit >= COMMIT_INTERVAL:
+            self._commit()
+
+    def _commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def flush(self):
+        """提交还没提交的写入（一次下载结束时调用）"""
+        with self._lock:
+            if self._uncommitted:
+                self._commit()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT url, size FROM responses ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.total_bytes -= size
+                self.stats["evicted"] += 1
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def summary(self):
+        s = self.stats
+        return (f"💾 缓存：直接命中 {s['fresh']} 次，304 校验命中 {s['revalidated']} 次，"
+                f"未命中 {s['misses']} 次，淘汰 {s['evicted']} 条")
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self.conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache()
+            atexit.register(_cache.flush)
+        return _cache
+
+
+def _is_fresh(entry, max_age):
+    return entry is not None and max_age > 0 and time.time() - entry[2] < max_age
+
+
+def fresh_cached(url, max_age, cache=None):
+    """缓存里有未过期的内容时直接返回正文，否则返回 None（不发请求）"""
+    cache = cache or get_cache()
+    entry = cache.lookup(url)
+    if _is_fresh(entry, max_age):
+        cache.touch(url)
+        return entry[1]
+    return None
+
+
+def cached_get(url, timeout=10, max_age=0, cache=None, cache_key=None):
+    """同步版：返回响应正文 bytes，非 200/304 时抛出 requests 的 HTTPError
+
+    cache_key 为缓存用的 URL（从镜像下载时用原站 URL，各镜像共用一份缓存），默认就是 url
+    """
+    cache = cache or get_cache()
+    key = cache_key or url
+    entry = cache.lookup(key)
+    if _is_fresh(entry, max_age):
+        cache.touch(key)
+        return entry[1]
+    with track_request(url, classify) as measure:
+        res = get_session().get(url, headers=cache.conditional_headers(entry), timeout=timeout)
+        if res.status_code == 304 and entry is not None:
+            cache.touch(key, revalidated=True)
+            return entry[1]
+        res.raise_for_status()
+        measure.bytes = len(res.content)
+    cache.store(key, res.headers, res.content)
+    return res.content
+
+
+async def cached_fetch(session, url, timeout=10, max_age=0, cache=None, cache_key=None):
+    """asyncio 版，session 为 aiohttp.ClientSession"""
+    cache = cache or get_cache()
+    key = cache_key or url
+    entry = cache.lookup(key)
+    if _is_fresh(entry, max_age):
+        cache.touch(key)
+        return entry[1]
+    with track_request(url, classify) as measure:
+        async with session.get(url, headers=cache.conditional_headers(entry),
+                               timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status == 304 and entry is not None:
+                cache.touch(key, revalidated=True)
+                return entry[1]
+            response.raise_for_status()
+            body = await response.read()
+            headers = dict(response.headers)
+        measure.bytes = len(body)
+    cache.store(key, headers, body)
+    return body
@@ -0,0 +1,113 @@
+import threading
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from rate_limiter import rate_limiter
+
+# ---------- 共享的长连接 HTTP 会话 ----------
+# 搜索、目录、章节请求都走这里：同一个 requests.Session（同步）或按引擎创建的
+# aiohttp 会话（异步），连接池大小与并发数一致，并统计连接复用（命中）与新建（未命中）次数；
+# 每个请求发出前都要先从 rate_limiter 里该站点的令牌桶取令牌
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Connection": "keep-alive",
+}
+DEFAULT_POOL_SIZE = 16
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def on_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def on_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self):
+        with self._lock:
+            hits = max(self.requests - self.new_connections, 0)
+            return {"requests": self.requests, "hits": hits, "misses": self.new_connections}
+
+    def summary(self):
+        s = self.snapshot()
+        return f"🔌 连接池：请求 {s['requests']} 次，复用连接 {s['hits']} 次，新建连接 {s['misses']} 次"
+
+
+pool_stats = PoolStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        pool_stats.on_new_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        pool_stats.on_new_connection()
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        rate_limiter.acquire(request.url)
+        pool_stats.on_request()
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def configure_session(pool_size=DEFAULT_POOL_SIZE, headers=None):
+    """按工作线程数重建共享会话，已有连接会被关闭"""
+    global _session
+    session = requests.Session()
+    session.headers.update(headers or DEFAULT_HEADERS)
+    adapter = PooledAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    with _session_lock:
+        old, _session = _session, session
+    if old is not None:
+        old.close()
+    return session
+
+
+def get_session():
+    with _session_lock:
+        session = _session
+    return session if session is not None else configure_session()
+
+
+def create_async_session(limit=DEFAULT_POOL_SIZE, headers=None):
+    """给 asyncio 引擎用的会话，连接数上限为 limit，同样计入 pool_stats"""
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, ctx, params):
+        # 请求真正发出前先从该站点的令牌桶取令牌
+        await rate_limiter.acquire_async(str(params.url))
+        pool_stats.on_request()
+
+    async def on_connection_create_end(session, ctx, params):
+        pool_stats.on_new_connection()
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit, ttl_dns_cache=300, keepalive_timeout=30)
+    return aiohttp.ClientSession(headers=headers or DEFAULT_HEADERS, connector=connector, trace_configs=[trace])
@@ -0,0 +1,64 @@
+import collections
+import threading
+from PyQt6.QtCore import Qt
+
+# ---------- 批量、有界的日志通道 ----------
+# 爬虫线程只把日志放进缓冲区（不经过 Qt 事件队列），界面线程用定时器成批取走再显示；
+# 缓冲区最多保留 max_lines 行，来不及显示的旧日志直接丢弃并计数，可选把完整日志同时写进文件。
+# 进度同理只保留最新值，每次刷新最多更新一次进度条
+
+DEFAULT_MAX_LINES = 2000
+FLUSH_INTERVAL_MS = 100  # 界面刷新间隔
+
+
+class LogChannel:
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, spill_path=None):
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        self._lines = collections.deque(maxlen=max_lines)
+        self._dropped = 0
+        self._progress = None
+        self._spill = None
+        if spill_path:
+            self.spill_to(spill_path)
+
+    def spill_to(self, path):
+        """之后的每一行日志都追加写入 path（完整日志，不受 max_lines 限制）"""
+        with self._lock:
+            if self._spill:
+                self._spill.close()
+            self._spill = open(path, "a", encoding="utf-8") if path else None
+
+    def attach(self, thread, spill_path=None):
+        """接上爬虫线程的 log_signal / progress_signal：直接在爬虫线程里写缓冲区，不为每条日志 / 每次进度排一个 Qt 事件；
+        spill_path 为 None 时不写日志文件"""
+        self.spill_to(spill_path)
+        thread.log_signal.connect(self.post, Qt.ConnectionType.DirectConnection)
+        thread.progress_signal.connect(self.set_progress, Qt.ConnectionType.DirectConnection)
+
+    def post(self, msg):
+        # 可在任意线程调用
+        with self._lock:
+            if len(self._lines) == self.max_lines:
+                self._dropped += 1
+            self._lines.append(msg)
+            if self._spill:
+                self._spill.write(msg + "\n")
+
+    def set_progress(self, value):
+        with self._lock:
+            self._progress = value
+
+    def drain(self):
+        """界面线程调用：返回 (待显示的行, 被丢弃的行数, 最新进度或 None)"""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped, self._dropped = self._dropped, 0
+            progress, self._progress = self._progress, None
+            if self._spill:
+                self._spill.flush()
+        return lines, dropped, progress
+
+    def close(self):
+        self.spill_to(None)
@@ -1,10 +1,20 @@
-import time
-import difflib
 import re
-import requests
-from bs4 import BeautifulSoup
-from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QPushButton, QTextEdit, QVBoxLayout, QHBoxLayout,QMessageBox, QProgressBar, QFrame, QVBoxLayout,QFileDialog
-from PyQt6.QtCore import Qt, QThread, pyqtSignal,QSize
+from http_session import configure_session, pool_stats
+from http_cache import get_cache
+from chapter_numbering import extract_chapter_number
+from output_sinks import open_sink, sink_class
+from adaptive_concurrency import AdaptiveDelay
+from prefetch import DEFAULT_DEPTH, ChapterPrefetcher
+from cancellation import call_abortable
+from retry_policy import RetryCancelled
+from rate_limiter import rate_limiter
+from retry_policy import retry_stats
+from book_index import get_book_index
+import metrics
+from novel_update import last_saved_chapter, move_with_meta, reset_output, save_meta
+from log_channel import DEFAULT_MAX_LINES, FLUSH_INTERVAL_MS, LogChannel
+from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout,QMessageBox, QProgressBar, QFrame, QVBoxLayout,QFileDialog,QCheckBox,QPlainTextEdit
+from PyQt6.QtCore import Qt, QThread, pyqtSignal,QSize,QTimer
 from PyQt6.QtGui import QFont,QIcon
 import sys
 
@@ -17,219 +27,9 @@ import sys
 #         base_path = os.path.abspath(".")
 #     return os.path.join(base_path, relative_path)
 
-# ---------- 爬虫函数（你提供的代码，稍作改造以支持中断和日志回调） ----------
-
-base_url = "https://www.00shu.la"
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
-}
-
-def normalize(text):
-    return text.strip().lower()
-
-def int_to_chinese(num):
-    units = ['', '十', '百', '千']
-    nums = ['零', '一', '二', '三', '四', '五', '六', '七', '八', '九']
-
-    if num == 0:
-        return nums[0]
-
-    result = ''
-    str_num = str(num)
-    length = len(str_num)
-
-    for i, digit_char in enumerate(str_num):
-        digit = int(digit_char)
-        pos = length - i - 1
-
-        if digit != 0:
-            if not (digit == 1 and pos == 1 and result == ''):
-                result += nums[digit]
-            result += units[pos]
-        else:
-            if i < length - 1 and str_num[i + 1] != '0':
-                result += nums[0]
-
-    if result.startswith('一十'):
-        result = result[1:]
-
-    return result
-
-def chinese_num_to_int(cn):
-    cn_num = {
-        '零':0, '一':1, '二':2, '三':3, '四':4, '五':5, '六':6,
-        '七':7, '八':8, '九':9, '十':10
-    }
-    if not cn:
-        return None
-    if cn.isdigit():
-        return int(cn)
-    if len(cn) == 1:
-        return cn_num.get(cn, None)
-    if len(cn) == 2:
-        if cn[0] == '十':
-            return 10 + cn_num.get(cn[1], 0)
-        elif cn[1] == '十':
-            return cn_num.get(cn[0], 0) * 10
-    if len(cn) == 3 and cn[1] == '十':
-        return cn_num.get(cn[0], 0) * 10 + cn_num.get(cn[2], 0)
-    return None
-
-def extract_chapter_number(title):
-    m = re.match(r"第([零一二三四五六七八九十百千万\d]+)章", title)
-    if m:
-        num_str = m.group(1)
-        if num_str.isdigit():
-            return int(num_str)
-        else:
-            return chinese_num_to_int(num_str)
-    m2 = re.match(r"([零一二三四五六七八九十百千万\d]+)章", title)
-    if m2:
-        num_str = m2.group(1)
-        if num_str.isdigit():
-            return int(num_str)
-        else:
-            return chinese_num_to_int(num_str)
-    return None
-
-def process_title(raw_title, chapter_num):
-    extracted_num = extract_chapter_number(raw_title)
-    chapter_num_cn = int_to_chinese(chapter_num)
-
-    if re.match(r"^第[零一二三四五六七八九十百千万\d]+章", raw_title) and extracted_num is not None:
-        if extracted_num != chapter_num:
-            new_title = re.sub(
-                r"第[零一二三四五六七八九十百千万\d]+章",
-                f"第{chapter_num_cn}章",
-                raw_title
-            )
-            return new_title
-        else:
-            new_title = re.sub(
-                r"第(\d+)章",
-                f"第{chapter_num_cn}章",
-                raw_title
-            )
-            return new_title
-
-    if extracted_num is not None:
-        new_title = re.sub(
-            r"^[零一二三四五六七八九十百千万\d]+章",
-            f"第{chapter_num_cn}章",
-            raw_title
-        )
-        return new_title
-
-    return f"第{chapter_num_cn}章 {raw_title}"
-
-def get_best_match_first_chapter(book_name, author_name, log_func):
-    try:
-        search_url = f"{base_url}/modules/article/search.php?q={book_name}"
-        res = requests.get(search_url, headers=headers, timeout=10)
-        res.encoding = 'utf-8'
-        soup = BeautifulSoup(res.text, 'html.parser')
-
-        rows = soup.select("table.grid tr#nr")
-        candidates = []
-
-        for row in rows:
-            title_a = row.select_one("td.odd a")
-            title = title_a.text.strip() if title_a else ""
-            book_url = title_a["href"] if title_a else ""
-
-            td_tags = row.find_all("td", class_="odd")
-            author = td_tags[1].get_text(strip=True) if len(td_tags) > 1 else ""
-
-            if title and book_url:
-                candidates.append({
-                    "title": title,
-                    "author": author,
-                    "url": book_url
-                })
-
-        if not candidates:
-            log_func("❌ 搜索结果为空")
-            return None
-
-        if author_name == "no":
-            for book in candidates:
-                if normalize(book["title"]) == normalize(book_name):
-                    log_func(f"✅ 找到完全匹配（无作者限制）：{book['title']}（作者：{book['author']}）")
-                    return get_first_chapter_link(book["url"], log_func)
-        else:
-            for book in candidates:
-                if normalize(book["title"]) == normalize(book_name) and normalize(book["author"]) == normalize(author_name):
-                    log_func(f"✅ 找到完全匹配（有作者限制）：{book['title']}（作者：{book['author']}）")
-                    return get_first_chapter_link(book["url"], log_func)
-
-        scored_books = []
-        for book in candidates:
-            title_score = difflib.SequenceMatcher(None, book_name, book["title"]).ratio()
-            author_score = difflib.SequenceMatcher(None, author_name, book["author"]).ratio() if author_name != "no" else 0.0
-            total_score = title_score * 0.7 + author_score * 0.3
-            scored_books.append((total_score, book))
-
-        best_match = max(scored_books, key=lambda x: x[0])
-        best_book = best_match[1]
-
-        log_func(f"⚠️ 未找到完全匹配，选择最相近：{best_book['title']}（作者：{best_book['author']}），匹配评分：{best_match[0]:.2f}")
-        return get_first_chapter_link(best_book["url"], log_func)
-
-    except Exception as e:
-        log_func(f"❌ 搜索失败：{e}")
-        return None
-
-def get_first_chapter_link(book_url, log_func):
-    try:
-        res = requests.get(book_url, headers=headers, timeout=10)
-        res.encoding = 'utf-8'
-        soup = BeautifulSoup(res.text, 'html.parser')
-        first_chapter = soup.select_one("div#list dd a")
-        if first_chapter:
-            return base_url + first_chapter["href"]
-        else:
-            log_func("❌ 未找到章节目录")
-            return None
-    except Exception as e:
-        log_func(f"❌ 获取章节失败：{e}")
-        return None
-
-def get_chapter(url, chapter_num, retries=3, timeout=10, log_func=None):
-    for attempt in range(retries):
-        try:
-            response = requests.get(url, headers=headers, timeout=timeout)
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            title_tag = soup.select_one("div.bookname h1")
-            raw_title = title_tag.get_text(strip=True) if title_tag else "无标题"
-
-            title = process_title(raw_title, chapter_num)
-
-            content_tag = soup.find("div", id="content")
-            if content_tag:
-                for tip in content_tag.select("div#content_tip"):
-                    tip.extract()
-                content = content_tag.get_text("\n", strip=True)
-            else:
-                content = "未获取到正文内容"
-
-            next_tag = soup.find("a", string="下一章")
-            next_url = base_url + next_tag["href"] if next_tag and next_tag.get("href") else None
-
-            return raw_title, title, content, next_url
-
-        except Exception as e:
-            if log_func:
-                log_func(f"⚠️ 第 {attempt+1} 次尝试失败：{e}")
-            time.sleep(1)
-
-    return None, None, None, None
-
-def save_to_txt(output_file, title, content):
-    with open(output_file, "a", encoding="utf-8") as f:
-        f.write(title + "\n\n")
-        f.write(content + "\n\n")
+# ---------- 爬虫函数 ----------
+# 搜索、目录、章节下载都在 novel_core 里（不依赖 PyQt6，命令行版也用它），这里只保留界面和线程
+from novel_core import fetch_chapter_body, get_all_chapters, get_best_match_first_chapter, get_chapter
 
 # -------------- 线程类保持不变 --------------
 class CrawlerThread(QThread):
@@ -237,51 +37,109 @@ class CrawlerThread(QThread):
     progress_signal = pyqtSignal(int)
     finished_signal = pyqtSignal(str)
 
-    def __init__(self, book_name, author_name, output_file):
+    def __init__(self, book_name, author_name, output_file, update=False, prefetch=DEFAULT_DEPTH, parser_backend=None):
         super().__init__()
         self.book_name = book_name
         self.author_name = author_name
         self.output_file = output_file
+        self.update = update  # 增量更新：只追加已有文件之后的新章节
+        self.prefetch = prefetch  # 往后预取的章数，0 为不预取
+        self.parser_backend = parser_backend  # 章节页解析后端，None 为默认的 lxml
         self._is_running = True
 
     def stop(self):
         self._is_running = False
 
     def run(self):
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            f.write("")
+        if self.update and not sink_class(self.output_file).appendable:
+            self.finished_signal.emit(f"{self.output_file} 的格式不支持增量更新，请重新下载整本书")
+            return
+        if not self.update:
+            reset_output(self.output_file)
+        # 共享连接池按线程数开：下载线程一个，再加上每个预取线程一个
+        configure_session(self.prefetch + 1)
 
         def log_func(msg):
             self.log_signal.emit(msg)
 
         log_func(f"开始搜索小说《{self.book_name}》 作者：{self.author_name}")
 
-        first_chapter_url = get_best_match_first_chapter(self.book_name, self.author_name, log_func)
+        stop_flag = lambda: not self._is_running
+        try:
+            first_chapter_url = call_abortable(get_best_match_first_chapter, stop_flag,
+                                               self.book_name, self.author_name, log_func)
+        except RetryCancelled:
+            self.finished_signal.emit("用户停止了爬取")
+            return
         if not first_chapter_url:
             self.finished_signal.emit("未找到小说章节起始链接，程序退出。")
             return
 
-        log_func(f"开始爬取章节列表，起始URL：{first_chapter_url}")
-
+        book_url = re.sub(r"/\d+\.html$", "/", first_chapter_url)
         url = first_chapter_url
         chapter_num = 1
 
+        if self.update:
+            last_index, last_url = last_saved_chapter(self.output_file, extract_chapter_number, book_url)
+            if last_url:
+                # 从上次保存的最后一章出发，沿“下一章”链接继续
+                _, _, _, url = get_chapter(last_url, last_index, log_func=log_func, backend=self.parser_backend)
+            elif last_index:
+                catalog = get_all_chapters(book_url, log_func)
+                url = catalog[last_index][1] if len(catalog) > last_index else None
+            chapter_num = last_index + 1
+            # 最后一章的“下一章”指回目录页，说明没有新章节
+            if not url or not url.endswith(".html"):
+                log_func(f"🔄 更新模式：已保存到第 {last_index} 章，没有新章节")
+                self.finished_signal.emit("已是最新，无需更新")
+                return
+            log_func(f"🔄 更新模式：已保存到第 {last_index} 章，从第 {chapter_num} 章继续")
+
+        log_func(f"开始爬取章节列表，起始URL：{url}")
+
+        # 平时的请求速率由共享令牌桶限制；被限流时再额外退避，站点恢复后逐步缩短到 0
+        pacer = AdaptiveDelay(initial=0.0)
+        # 后台按章节编号往后预取几章，猜对的章节直接从缓存取
+        prefetcher = ChapterPrefetcher(fetch_chapter_body, depth=self.prefetch) if self.prefetch else None
+        # 整个下载过程只打开一次输出文件；格式按扩展名选择（.txt / .txt.gz / .txt.zst / .epub）
+        sink = open_sink(self.output_file, append=True, title=self.book_name, author=self.author_name)
+
         while url and self._is_running:
             log_func(f"\n📖 正在爬取第 {chapter_num} 章：{url}")
-            raw_title, title, content, next_url = get_chapter(url, chapter_num, log_func=log_func)
+            if prefetcher:
+                prefetcher.wait(url, stop_flag)
+            raw_title, title, content, next_url = get_chapter(url, chapter_num, log_func=log_func, pacer=pacer,
+                                                           stop_flag=stop_flag, backend=self.parser_backend)
 
             if content:
+                if prefetcher:
+                    prefetcher.advance(url, next_url)
                 log_func(f"🔎 div.bookname h1 原始标题内容：{raw_title}")
                 log_func(f"✅ 处理后的标题：{title}")
-                save_to_txt(self.output_file, title, content)
-                url = next_url
+                sink.write(chapter_num, title, content)
+                sink.flush()
+                save_meta(self.output_file, book_url, chapter_num, url)
+                # 最后一章的“下一章”指回目录页，到这里就结束
+                url = next_url if next_url and next_url.endswith(".html") else None
                 chapter_num += 1
                 self.progress_signal.emit(chapter_num)
-                time.sleep(0.1)
+                pacer.wait()
             else:
                 log_func("❌ 获取失败，已终止爬取。")
                 break
 
+        sink.close()
+        if prefetcher:
+            prefetcher.close()
+            log_func(prefetcher.summary())
+        log_func(pool_stats.summary())
+        get_cache().flush()
+        log_func(get_cache().summary())
+        log_func(rate_limiter.summary())
+        log_func(retry_stats.summary())
+        log_func(get_book_index().summary())
+        log_func(metrics.summary())
+        metrics.registry.write_json()
         if self._is_running:
             log_func(f"\n✅ 爬取完成，小说保存至：{self.output_file}")
             self.finished_signal.emit("爬取完成")
@@ -391,10 +249,11 @@ class MainWindow(QWidget):
         self.btn_stop.setStyleSheet(btn_style)
 
         # 日志显示区
-        self.log_text = QTextEdit()
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.setMaximumBlockCount(DEFAULT_MAX_LINES)  # 只保留最近的日志
         self.log_text.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #ffffff;
                 border: 2px solid #87a9d6;
                 border-radius: 8px;
@@ -468,6 +327,10 @@ QProgressBar::chunk {
 
         self.is_maximized = False
 
+        # 增量更新：勾选后选择已有的小说文件，只追加新章节
+        self.check_update = QCheckBox("更新已有小说（只下载新章节）")
+        self.check_spill = QCheckBox("同时把完整日志保存到 .log 文件")
+
         # 后面你的整体布局保持不变
         layout = QVBoxLayout(main_widget)
         layout.setSpacing(12)
@@ -476,6 +339,8 @@ QProgressBar::chunk {
         layout.addWidget(self.input_book)
         layout.addWidget(self.label_author)
         layout.addWidget(self.input_author)
+        layout.addWidget(self.check_update)
+        layout.addWidget(self.check_spill)
 
         btn_layout = QHBoxLayout()
         btn_layout.addWidget(self.btn_start)
@@ -488,6 +353,12 @@ QProgressBar::chunk {
         # 初始化线程为 None
         self.crawler_thread = None
 
+        # 爬虫线程的日志和进度先进缓冲区，由定时器成批刷到界面
+        self.log_channel = LogChannel()
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start(FLUSH_INTERVAL_MS)
+
         # 绑定按钮事件
         self.btn_start.clicked.connect(self.start_crawling)
         self.btn_stop.clicked.connect(self.stop_crawling)
@@ -523,48 +394,74 @@ QProgressBar::chunk {
 
         # 默认保存路径
         self.output_path = f"{book_name}.txt"
+        update = self.check_update.isChecked()
+        if update:
+            file_path, _ = QFileDialog.getOpenFileName(self, "选择要更新的小说文件", self.output_path, "Text Files (*.txt)")
+            if not file_path:
+                return
+            self.output_path = file_path
 
         self.btn_start.setEnabled(False)
         self.btn_stop.setEnabled(True)
 
-        self.thread = CrawlerThread(book_name, author_name, self.output_path)
-        self.thread.log_signal.connect(self.append_log)
-        self.thread.progress_signal.connect(self.update_progress)
+        self.thread = CrawlerThread(book_name, author_name, self.output_path, update=update)
+        self.attach_log(self.thread, self.output_path + ".log")
         self.thread.finished_signal.connect(self.crawling_finished)
         self.thread.start()
 
     def stop_crawling(self):
         if hasattr(self, 'thread') and self.thread and self.thread.isRunning():
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "保存小说文件", self.output_path, "Text Files (*.txt)"
-            )
-            if file_path:
-                # 重命名当前保存的 txt 文件
-                try:
-                    import shutil
-                    shutil.move(self.output_path, file_path)
-                    self.append_log(f"📁 已将小说文件保存至：{file_path}")
-                except Exception as e:
-                    self.append_log(f"❌ 保存失败：{e}")
+            # 只发出停止请求，不在这里 wait() 卡住界面；线程结束（finished_signal）后再询问保存路径
             self.thread.stop()
-            self.thread.wait()
+            self.btn_stop.setEnabled(False)
+            self.save_after_stop = True
+            self.append_log("⏹️ 正在停止……")
+
+    def ask_save_path(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存小说文件", self.output_path, "Text Files (*.txt)"
+        )
+        if file_path:
+            # 重命名当前保存的 txt 文件
+            try:
+                move_with_meta(self.output_path, file_path)
+                self.append_log(f"📁 已将小说文件保存至：{file_path}")
+            except Exception as e:
+                self.append_log(f"❌ 保存失败：{e}")
 
     def update_progress(self, count):
         self.progress_bar.setMaximum(10000)  # 任意大值
         self.progress_bar.setValue(count)
 
     def crawling_finished(self, msg):
+        self.flush_log()
         self.btn_start.setEnabled(True)
         self.btn_stop.setEnabled(False)
+        if getattr(self, "save_after_stop", False):
+            self.save_after_stop = False
+            self.ask_save_path()
         QMessageBox.information(self, "完成", msg)
 
+    def attach_log(self, thread, spill_path):
+        self.log_channel.attach(thread, spill_path if self.check_spill.isChecked() else None)
+
+    def flush_log(self):
+        lines, dropped, progress = self.log_channel.drain()
+        if dropped:
+            self.log_text.appendPlainText(f"…… 日志太多，省略了 {dropped} 行 ……")
+        if lines:
+            self.log_text.appendPlainText("\n".join(lines))
+        if progress is not None:
+            self.update_progress(progress)
+
     def append_log(self, text):
-        self.log_text.append(text)
+        self.log_channel.post(text)
 
     def closeEvent(self, event):
         if hasattr(self, 'thread') and self.thread.isRunning():
             self.thread.stop()
             self.thread.wait()
+        self.log_channel.close()
         event.accept()
 
 
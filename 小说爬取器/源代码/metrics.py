@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# ---------- 爬虫指标 ----------
+# 计数器（请求数、字节数、重试、错误，按 host 分）、直方图（请求延迟、解析耗时、写盘耗时）
+# 和仪表（在途请求数）都登记在全局 registry 里；可以导出 Prometheus 文本格式
+# （写文件或在本地起一个 /metrics 端口），爬完后再输出一份 JSON 汇总
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_JSON = "crawl_metrics.json"
+
+
+def host_of(url):
+    return urlsplit(url).hostname or ""
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return {_format_labels(key) or "total": value for key, value in self._values.items()}
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # key -> [每个桶的计数..., 总和, 总数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    out.append((self.name + "_bucket", key + (("le", repr(bound)),), cumulative))
+                out.append((self.name + "_bucket", key + (("le", "+Inf"),), series[-1]))
+                out.append((self.name + "_sum", key, series[-2]))
+                out.append((self.name + "_count", key, series[-1]))
+        return out
+
+    def _quantile(self, series, q):
+        # 按桶估算分位数（取所在桶的上界）；落在最后一个桶之外时取最大的有限上界，
+        # 不返回 inf，否则 json.dump 写出的 Infinity 不是合法 JSON
+        target = q * series[-1]
+        cumulative = 0
+        for bound, count in zip(self.buckets, series):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                _format_labels(key) or "total": {
+                    "count": series[-1],
+                    "sum": round(series[-2], 6),
+                    "avg": round(series[-2] / series[-1], 6) if series[-1] else 0.0,
+                    "p50": self._quantile(series, 0.5),
+                    "p95": self._quantile(series, 0.95),
+                }
+                for key, series in self._series.items()
+            }
+
+    def totals(self):
+        with self._lock:
+            return sum(s[-1] for s in self._series.values()), sum(s[-2] for s in self._series.values())
+
+    def quantile(self, q):
+        """所有标签合在一起的分位数估计"""
+        with self._lock:
+            merged = [sum(column) for column in zip(*self._series.values())]
+        return self._quantile(merged, q) if merged and merged[-1] else 0.0
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._register(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, buckets=buckets)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def write_textfile(self, path):
+        """写 Prometheus 文本文件（node_exporter textfile collector 可直接读取）"""
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def write_json(self, path=DEFAULT_JSON):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """在后台线程里提供 http://host:port/metrics，返回 server（调用 shutdown() 关闭）"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                data = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+registry = Registry()
+
+# 各模块共用的指标
+REQUESTS = registry.counter("crawler_requests_total", "实际发出的 HTTP 请求数（不含缓存直接命中）")
+RESPONSE_BYTES = registry.counter("crawler_response_bytes_total", "下载的响应正文字节数")
+ERRORS = registry.counter("crawler_errors_total", "失败的请求数（按 host 和原因）")
+RETRIES = registry.counter("crawler_retries_total", "重试次数（按 host 和原因）")
+HEDGES = registry.counter("crawler_hedged_requests_total", "向第二个镜像发出的对冲请求（sent）及其先返回的次数（won）")
+PREFETCHES = registry.counter("crawler_prefetch_total",
+                              "顺序爬取的预取：按步长猜中（hit）、没猜中只能等已知的下一章（miss）、猜错作废（wasted）")
+FAILOVERS = registry.counter("crawler_mirror_failovers_total", "镜像出错后换到下一个镜像的次数（按出错的 host）")
+IN_FLIGHT = registry.gauge("crawler_in_flight_requests", "正在进行的请求数")
+FETCH_SECONDS = registry.histogram("crawler_fetch_seconds", "单次请求耗时（秒，含限速等待）")
+RATE_WAIT = registry.histogram("crawler_rate_limit_wait_seconds", "请求发出前在令牌桶上等待的时间（秒）")
+PARSE_SECONDS = registry.histogram("crawler_parse_seconds", "解析一个页面的耗时（秒）")
+WRITE_SECONDS = registry.histogram("crawler_write_seconds", "写盘耗时（秒）")
+
+
+class _RequestTracker:
+    def __init__(self, url, classify):
+        self.host = host_of(url)
+        self.classify = classify
+        self.bytes = 0  # 调用方拿到正文后填上
+
+    def __enter__(self):
+        IN_FLIGHT.inc()
+        REQUESTS.inc(host=self.host)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        IN_FLIGHT.dec()
+        FETCH_SECONDS.observe(time.perf_counter() - self.start, host=self.host)
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):  # 对冲输掉被取消不算错误
+            cause = self.classify(exc) if self.classify else exc_type.__name__
+            ERRORS.inc(host=self.host, cause=cause)
+        elif self.bytes:
+            RESPONSE_BYTES.inc(self.bytes, host=self.host)
+        return False
+
+
+def track_request(url, classify=None):
+    """with track_request(url) as t: ... 记录一次真正发出的请求：在途数、耗时、字节数（t.bytes），
+    失败时按 classify(异常) 的结果计入错误数"""
+    return _RequestTracker(url, classify)
+
+
+def summary():
+    """一行文字版汇总，给日志用"""
+    fetches, fetch_sum = FETCH_SECONDS.totals()
+    parses, parse_sum = PARSE_SECONDS.totals()
+    writes, write_sum = WRITE_SECONDS.totals()
+    waits, wait_sum = RATE_WAIT.totals()
+    avg = lambda total, n: total / n * 1000 if n else 0.0
+    return (f"📈 指标：请求 {REQUESTS.total()} 次，下载 {RESPONSE_BYTES.total() / 1024 / 1024:.1f} MB，"
+            f"错误 {ERRORS.total()} 次，重试 {RETRIES.total()} 次；"
+            f"平均请求 {avg(fetch_sum, fetches):.1f} ms（其中限速等待 {avg(wait_sum, waits):.1f} ms），解析 {avg(parse_sum, parses):.2f} ms，"
+            f"写盘 {avg(write_sum, writes):.2f} ms")
@@ -0,0 +1,211 @@
+import asyncio
+import collections
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+from metrics import FAILOVERS, HEDGES
+from retry_policy import CLIENT, classify
+
+# ---------- 镜像站点：故障切换和对冲请求 ----------
+# 同一本书可以从几个内容相同的镜像下载。每个镜像记录健康状况（平均延迟、连续失败次数），
+# 连续失败 FAILURES_TO_TRIP 次就暂停使用一段时间；请求总是先发给当前最快的健康镜像，失败时换下一个。
+# asyncio 版还会做对冲：请求超过最近成功延迟的 p95 还没返回，就向第二个镜像再发一份，
+# 先回来的正常结果胜出，另一份取消；对冲数不超过请求数的 HEDGE_BUDGET，站点整体变慢时不会翻倍施压
+
+HEDGE_PERCENTILE = 0.95
+HEDGE_BUDGET = 0.1  # 对冲请求最多占总请求的比例
+DEFAULT_HEDGE_DELAY = 2.0  # 样本不足时的对冲等待（秒）
+MIN_HEDGE_DELAY = 0.05
+LATENCY_WINDOW = 200  # 用最近多少次成功请求估计延迟分位数
+MIN_SAMPLES = 20
+FAILURES_TO_TRIP = 3
+BASE_COOLDOWN = 30.0  # 第一次暂停的秒数，之后每多失败一次翻倍
+MAX_COOLDOWN = 300.0
+
+
+def origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def rewrite(url, host):
+    """把 url 换到镜像 host 上（路径和查询参数不变）"""
+    parts, target = urlsplit(url), urlsplit(host)
+    return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+
+class _Health:
+    def __init__(self):
+        self.latency = None  # 成功请求延迟的指数移动平均
+        self.successes = 0
+        self.failures = 0
+        self.consecutive = 0
+        self.down_until = 0.0
+
+
+class MirrorPool:
+    def __init__(self, hosts=()):
+        self._lock = threading.Lock()
+        self.hosts = []
+        self._health = {}
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.configure(hosts)
+
+    def configure(self, hosts):
+        """设置镜像列表（如 ["https://www.00shu.la", "https://m.00shu.la"]），都视为同一站点的副本"""
+        with self._lock:
+            self.hosts = [origin(h) if "//" in h else f"https://{h}" for h in hosts]
+            for host in self.hosts:
+                self._health.setdefault(host, _Health())
+
+    def ranked(self, url):
+        """url 可用的镜像，健康的按平均延迟从低到高排在前面，暂停中的按恢复时间排在后面"""
+        own = origin(url)
+        with self._lock:
+            hosts = self.hosts if own in self.hosts else [own] + self.hosts
+            for host in hosts:
+                self._health.setdefault(host, _Health())
+            now = time.monotonic()
+            up = [h for h in hosts if self._health[h].down_until <= now]
+            down = sorted((h for h in hosts if self._health[h].down_until > now),
+                          key=lambda h: self._health[h].down_until)
+            # 还没测过的镜像延迟记为 0，会被优先试一次
+            return sorted(up, key=lambda h: self._health[h].latency or 0.0) + down
+
+    def record(self, host, latency=None, error=None):
+        with self._lock:
+            health = self._health.setdefault(host, _Health())
+            if error is None:
+                health.successes += 1
+                health.consecutive = 0
+                health.down_until = 0.0
+                health.latency = latency if health.latency is None else 0.8 * health.latency + 0.2 * latency
+                self._latencies.append(latency)
+                return
+            health.failures += 1
+            # 404 之类只说明这个镜像缺这一页，不算镜像本身出了问题
+            if classify(error) == CLIENT:
+                return
+            health.consecutive += 1
+            if health.consecutive >= FAILURES_TO_TRIP:
+                cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (health.consecutive - FAILURES_TO_TRIP))
+                health.down_until = time.monotonic() + cooldown
+
+    def hedge_delay(self):
+        """最近成功请求延迟的 HEDGE_PERCENTILE 分位数"""
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            samples = sorted(self._latencies)
+        return max(MIN_HEDGE_DELAY, samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE))])
+
+    def _may_hedge(self, host):
+        # 只向健康的镜像对冲；暂停中的镜像只在其他镜像都失败时才试
+        with self._lock:
+            return self.hedges < self.requests * HEDGE_BUDGET and self._health[host].down_until <= time.monotonic()
+
+    def _count(self, name, counter=None, **labels):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+        if counter is not None:
+            counter.inc(**labels)
+
+    def fetch(self, url, fetch_func):
+        """同步版：fetch_func(镜像上的 url) 返回正文；失败就换下一个镜像，全部失败时抛出最后的异常"""
+        hosts = self.ranked(url)
+        self._count("requests")
+        for i, host in enumerate(hosts):
+            start = time.monotonic()
+            try:
+                body = fetch_func(rewrite(url, host))
+            except Exception as e:
+                self.record(host, error=e)
+                if i + 1 == len(hosts):
+                    raise
+                self._count("failovers", FAILOVERS, host=urlsplit(host).hostname)
+                continue
+            self.record(host, latency=time.monotonic() - start)
+            return body
+
+    async def _timed(self, host, coro):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            body = await coro
+        except asyncio.CancelledError:
+            raise  # 对冲输掉被取消，不算镜像的失败
+        except Exception as e:
+            self.record(host, error=e)
+            raise
+        self.record(host, latency=loop.time() - start)
+        return body
+
+    async def fetch_async(self, url, fetch_func):
+        """asyncio 版：fetch_func(镜像上的 url) 返回协程；慢了就对冲，失败就切换"""
+        hosts = self.ranked(url)
+        self._count("requests")
+        if len(hosts) == 1:
+            return await self._timed(hosts[0], fetch_func(url))
+
+        pending = {}  # 任务 -> 镜像
+        next_host = 0
+
+        def launch():
+            nonlocal next_host
+            host = hosts[next_host]
+            next_host += 1
+            pending[asyncio.ensure_future(self._timed(host, fetch_func(rewrite(url, host))))] = host
+
+        launch()
+        hedged = False
+        last_error = None
+        try:
+            while pending:
+                timeout = None
+                if not hedged and next_host < len(hosts) and self._may_hedge(hosts[next_host]):
+                    timeout = self.hedge_delay()
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 第一份请求太慢：向下一个镜像再发一份，两份谁先回来用谁
+                    hedged = True
+                    self._count("hedges", HEDGES, outcome="sent")
+                    launch()
+                    continue
+                for task in done:
+                    host = pending.pop(task)
+                    try:
+                        body = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if hedged and host != hosts[0]:
+                        self._count("hedge_wins", HEDGES, outcome="won")
+                    return body
+                if not pending and next_host < len(hosts):
+                    self._count("failovers", FAILOVERS, host=urlsplit(hosts[next_host - 1]).hostname)
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def summary(self):
+        with self._lock:
+            hosts = [(h, self._health[h]) for h in self._health]
+            if len(hosts) < 2:
+                return "🪞 镜像：未配置"
+            lines = [f"🪞 镜像：请求 {self.requests} 次，切换 {self.failovers} 次，"
+                     f"对冲 {self.hedges} 次（备份先返回 {self.hedge_wins} 次）"]
+            now = time.monotonic()
+            for host, h in hosts:
+                latency = f"{h.latency * 1000:.0f} ms" if h.latency is not None else "-"
+                state = "暂停中" if h.down_until > now else "正常"
+                lines.append(f"  {host}：成功 {h.successes}，失败 {h.failures}，平均延迟 {latency}，{state}")
+        return "\n".join(lines)
+
+
+mirror_pool = MirrorPool()
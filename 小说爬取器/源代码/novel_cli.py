@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import sys
+import time
+from async_engine import DEFAULT_CONCURRENCY
+from batch_queue import DEFAULT_PARALLEL, DONE, assign_output_files, load_jobs, run_batch, summarize
+from checkpoint import DEFAULT_JOURNAL
+from chapter_parser import BACKENDS, get_backend
+from http_cache import get_cache
+from http_session import pool_stats
+from mirrors import mirror_pool
+import metrics
+from novel_core import crawl_book
+from parse_pool import DEFAULT_BATCH_SIZE, DEFAULT_PARSE_WORKERS
+from rate_limiter import rate_limiter
+from retry_policy import retry_stats
+from book_index import get_book_index
+from chapter_store import ChapterStore
+from output_sinks import FORMATS
+from reading import ReadingSession
+
+# ---------- 命令行版小说爬取器 ----------
+# 不导入 PyQt6，可在没有图形界面的服务器上运行；日志和进度都输出到 stderr
+# 用法：python -m novel_cli 书名 [-a 作者] [-o 输出.txt] [-f txt|gz|zst|epub] [-c 并发数]
+#       python -m novel_cli --jobs 任务清单.txt [-d 保存目录] [-p 同时下载本数]
+
+
+class Progress:
+    """把进度写到 stderr：终端里原地刷新，重定向到文件时每 10% 打一行"""
+
+    def __init__(self, stream=sys.stderr):
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.total = 0
+        self.done = 0
+        self._last_step = -1
+        self._start = time.monotonic()
+
+    def set_total(self, total):
+        self.total = total
+        self._last_step = -1
+
+    def update(self, done):
+        self.done = done
+        elapsed = time.monotonic() - self._start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        line = f"进度 {done}/{self.total or '?'} 章  {rate:.1f} 章/秒"
+        if self.tty:
+            self.stream.write("\r" + line)
+            self.stream.flush()
+            return
+        step = done * 10 // self.total if self.total else 0
+        if step != self._last_step:
+            self._last_step = step
+            print(line, file=self.stream)
+
+    def log(self, msg):
+        if self.tty and self.done:
+            self.stream.write("\r\033[K")  # 先清掉进度行
+        print(msg, file=self.stream)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m novel_cli", description="小说爬取器（命令行版）")
+    parser.add_argument("book", nargs="?", help="小说名称")
+    parser.add_argument("-a", "--author", default="", help="作者名称，不知道可以不填")
+    parser.add_argument("-o", "--output", help="输出文件，默认为 书名.txt；按扩展名 .txt / .txt.gz / .txt.zst / .epub 选择格式")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="txt", help="没有用 -o 指定文件时的输出格式（批量下载也用它）")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同时在途的请求数上限")
+    parser.add_argument("-w", "--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                        help="解析进程数，0 为在事件循环里直接解析；多核机器可设为 CPU 核数")
+    parser.add_argument("--parser", choices=BACKENDS, default=get_backend(), help="章节页解析后端：lxml 快，bs4 为原来的实现")
+    parser.add_argument("--parse-batch", type=int, default=DEFAULT_BATCH_SIZE, help="每次送进解析进程的页数")
+    parser.add_argument("-u", "--update", action="store_true", help="只追加输出文件里还没有的新章节")
+    parser.add_argument("--read-from", type=int, help="先下载这一章和之后的几章（想从中间开始看时用），其余照常下载")
+    parser.add_argument("--no-resume", action="store_true", help="忽略断点日志，全部重新下载")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL, help="断点日志文件")
+    parser.add_argument("--library", help="同时把章节存进这个本地书库（SQLite），可用 python -m novel_library 全文搜索")
+    parser.add_argument("-m", "--mirror", action="append", default=[],
+                        help="与原站内容相同的镜像站点，可多次指定；出错时换镜像，太慢时向镜像发对冲请求")
+    parser.add_argument("--jobs", help="批量任务清单，每行：书名,作者")
+    parser.add_argument("-d", "--output-dir", default=".", help="批量下载的保存目录")
+    parser.add_argument("-p", "--parallel", type=int, default=DEFAULT_PARALLEL, help="批量下载时同时进行的书数")
+    parser.add_argument("--metrics-json", default=metrics.DEFAULT_JSON, help="结束时写出的 JSON 指标汇总，留空则不写")
+    parser.add_argument("--metrics-file", help="结束时写出 Prometheus 文本格式的指标文件")
+    parser.add_argument("--metrics-port", type=int, help="运行期间在 127.0.0.1:端口/metrics 提供 Prometheus 指标")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出进度和汇总，不输出逐章日志")
+    args = parser.parse_args(argv)
+    if not args.book and not args.jobs:
+        parser.error("需要指定小说名称或 --jobs 任务清单")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    progress = Progress()
+    log_func = (lambda msg: None) if args.quiet else progress.log
+
+    # 第一次 Ctrl+C 只是请求停止，已下载的章节照常写盘；再按一次直接退出
+    stopping = []
+
+    def on_sigint(signum, frame):
+        if stopping:
+            raise KeyboardInterrupt
+        stopping.append(True)
+        progress.log("⏹️ 收到中断，正在停止……")
+
+    signal.signal(signal.SIGINT, on_sigint)
+    if args.metrics_port:
+        metrics.registry.serve(args.metrics_port)
+        progress.log(f"📈 指标地址：http://127.0.0.1:{args.metrics_port}/metrics")
+    stop_flag = lambda: bool(stopping)
+    if args.mirror:
+        mirror_pool.configure(args.mirror)
+    store = ChapterStore(args.library) if args.library else None
+
+    if args.jobs:
+        jobs = assign_output_files(load_jobs(args.jobs), args.output_dir, FORMATS[args.format])
+
+        def on_update(job):
+            progress.set_total(sum(j.total for j in jobs))
+            progress.update(sum(j.done for j in jobs))
+
+        def crawl(job, log_func, progress_func, total_func, session, limiter, parser):
+            return crawl_book(
+                job.book_name, job.author_name, job.output_file, log_func,
+                progress_func=progress_func, total_func=total_func, stop_flag=stop_flag,
+                concurrency=args.concurrency, resume=not args.no_resume, journal_path=args.journal,
+                session=session, limiter=limiter, parser=parser, store=store, parser_backend=args.parser,
+            )
+
+        asyncio.run(run_batch(jobs, crawl, log_func, parallel=args.parallel, concurrency=args.concurrency,
+                              stop_flag=stop_flag, on_update=on_update,
+                              parse_workers=args.parse_workers, parse_batch=args.parse_batch,
+                              parser_backend=args.parser))
+        ok, msg = all(job.status == DONE for job in jobs), summarize(jobs)
+    else:
+        ok, msg = asyncio.run(crawl_book(
+            args.book, args.author, args.output or f"{args.book}{FORMATS[args.format]}", log_func,
+            progress_func=progress.update, total_func=progress.set_total, stop_flag=stop_flag,
+            concurrency=args.concurrency, resume=not args.no_resume, journal_path=args.journal,
+            update=args.update, parse_workers=args.parse_workers, parse_batch=args.parse_batch, store=store,
+            reading=ReadingSession(args.read_from) if args.read_from else None, parser_backend=args.parser,
+        ))
+
+    lines = [pool_stats.summary(), get_cache().summary(), rate_limiter.summary(), retry_stats.summary(),
+             get_book_index().summary(), metrics.summary(), msg]
+    if args.mirror:
+        lines.insert(4, mirror_pool.summary())
+    if store is not None:
+        lines.insert(-2, store.summary())
+        store.close()
+    for line in lines:
+        progress.log(line)
+    if args.metrics_json:
+        metrics.registry.write_json(args.metrics_json)
+    if args.metrics_file:
+        metrics.registry.write_textfile(args.metrics_file)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,351 @@
+import re
+from bs4 import BeautifulSoup
+from book_index import get_book_index, match_score
+from http_session import DEFAULT_HEADERS, get_session
+from http_cache import CATALOG_MAX_AGE, CHAPTER_MAX_AGE, cached_get, fresh_cached, get_cache
+from mirrors import mirror_pool
+from async_engine import crawl_chapters, DEFAULT_CONCURRENCY
+from adaptive_concurrency import AdaptiveLimiter, OK, classify_error
+from ordered_writer import OrderedChapterWriter
+from output_sinks import open_sink, sink_class
+from checkpoint import ChapterJournal, DEFAULT_JOURNAL, split_resumable
+from chapter_parser import extract_chapter
+from parse_pool import DEFAULT_BATCH_SIZE, DEFAULT_PARSE_WORKERS, ParsePool
+from chapter_numbering import extract_chapter_number, process_title, renumber_catalog
+from retry_policy import RetryCancelled, RetryPolicy
+from metrics import WRITE_SECONDS
+from cancellation import call_abortable, run_abortable
+from novel_update import last_saved_chapter, reset_output, save_meta
+
+# ---------- 小说爬虫核心 ----------
+# 搜索、目录、章节下载和整本书的下载流程，不依赖 PyQt6：
+# 图形界面（main.py / main0531.py）和命令行（python -m novel_cli）都从这里导入
+
+base_url = "https://www.00shu.la"
+headers = DEFAULT_HEADERS
+fetch_policy = RetryPolicy()  # 目录页和章节页共用的重试策略
+# 获取目录：[(序号, 章节URL, 目录中的章节名), ...]
+def get_catalog(book_url, log_func):
+    try:
+        body = fetch_policy.run(
+            lambda: mirror_pool.fetch(book_url, lambda mirror_url: cached_get(
+                mirror_url, timeout=10, max_age=CATALOG_MAX_AGE, cache_key=book_url)),
+            on_retry=lambda n, e, delay: log_func(f"⚠️ 获取目录第 {n} 次失败：{e}，{delay:.1f}s 后重试"),
+            url=book_url,
+        )
+        soup = BeautifulSoup(body.decode('utf-8', errors='replace'), 'html.parser')
+        chapter_tags = soup.select("div#list dd a")
+
+        catalog = []
+        for idx, tag in enumerate(chapter_tags, 1):
+            href = tag["href"]
+            chapter_url = base_url + href
+            catalog.append((idx, chapter_url, tag.get_text(strip=True)))
+
+        log_func(f"📚 共获取到 {len(catalog)} 个章节链接。")
+        return catalog
+
+    except Exception as e:
+        log_func(f"❌ 获取章节目录失败：{e}")
+        return []
+
+# 获取所有章节
+def get_all_chapters(book_url, log_func):
+    return [(idx, url) for idx, url, _ in get_catalog(book_url, log_func)]
+
+
+def normalize(text):
+    return text.strip().lower()
+
+def get_best_match_first_chapter(book_name, author_name, log_func):
+    # 先查本地书目，书名（和作者）完全相同才不再请求搜索页，只是相近的照样在线搜索；地址失效时删掉再在线搜索
+    index = get_book_index()
+    hit = index.lookup(book_name, author_name)
+    if hit:
+        _, book = hit
+        log_func(f"📇 本地书目命中：{book['title']}（作者：{book['author']}）")
+        first_chapter_url = get_first_chapter_link(book["url"], log_func)
+        if first_chapter_url:
+            return first_chapter_url
+        index.forget(book["url"])
+        log_func("⚠️ 本地书目中的地址已失效，改为在线搜索")
+
+    try:
+        search_url = f"{base_url}/modules/article/search.php?q={book_name}"
+        res = get_session().get(search_url, timeout=10)
+        res.encoding = 'utf-8'
+        soup = BeautifulSoup(res.text, 'html.parser')
+
+        rows = soup.select("table.grid tr#nr")
+        candidates = []
+
+        for row in rows:
+            title_a = row.select_one("td.odd a")
+            title = title_a.text.strip() if title_a else ""
+            book_url = title_a["href"] if title_a else ""
+
+            td_tags = row.find_all("td", class_="odd")
+            author = td_tags[1].get_text(strip=True) if len(td_tags) > 1 else ""
+
+            if title and book_url:
+                candidates.append({
+                    "title": title,
+                    "author": author,
+                    "url": book_url
+                })
+
+        if not candidates:
+            log_func("❌ 搜索结果为空")
+            return None
+        index.add_many(candidates)
+
+        # main.py 界面约定不知道作者时填 no，main0531.py 则留空
+        if author_name in ("", "no"):
+            for book in candidates:
+                if normalize(book["title"]) == normalize(book_name):
+                    log_func(f"✅ 找到完全匹配（无作者限制）：{book['title']}（作者：{book['author']}）")
+                    return get_first_chapter_link(book["url"], log_func)
+        else:
+            for book in candidates:
+                if normalize(book["title"]) == normalize(book_name) and normalize(book["author"]) == normalize(author_name):
+                    log_func(f"✅ 找到完全匹配（有作者限制）：{book['title']}（作者：{book['author']}）")
+                    return get_first_chapter_link(book["url"], log_func)
+
+        scored_books = [(match_score(book_name, author_name, book["title"], book["author"]), book)
+                        for book in candidates]
+
+        best_match = max(scored_books, key=lambda x: x[0])
+        best_book = best_match[1]
+
+        log_func(f"⚠️ 未找到完全匹配，选择最相近：{best_book['title']}（作者：{best_book['author']}），匹配评分：{best_match[0]:.2f}")
+        return get_first_chapter_link(best_book["url"], log_func)
+
+    except Exception as e:
+        log_func(f"❌ 搜索失败：{e}")
+        return None
+
+def get_first_chapter_link(book_url, log_func):
+    try:
+        res = get_session().get(book_url, timeout=10)
+        res.encoding = 'utf-8'
+        soup = BeautifulSoup(res.text, 'html.parser')
+        first_chapter = soup.select_one("div#list dd a")
+        if first_chapter:
+            return base_url + first_chapter["href"]
+        else:
+            log_func("❌ 未找到章节目录")
+            return None
+    except Exception as e:
+        log_func(f"❌ 获取章节失败：{e}")
+        return None
+
+def parse_chapter(body, chapter_num, titles=None, backend=None):
+    return finish_chapter(extract_chapter(body, backend), chapter_num, titles)
+
+def finish_chapter(extracted, chapter_num, titles=None):
+    """extracted 为 extract_chapter 的结果 (raw_title, content, next_href)，补上处理后的标题和完整的下一章 URL"""
+    raw_title, content, next_href = extracted
+    # 标题以章节页的 h1 为准，只把序号改写成 第{中文序号}章（目录里的章节名可能被截断）；
+    # 页面没有标题时才用目录里预先编好的标题
+    title = titles.get(chapter_num) if titles and raw_title in ("", "无标题") else None
+    if not title:
+        title = process_title(raw_title, chapter_num)
+    next_url = base_url + next_href if next_href else None
+    return raw_title, title, content, next_url
+
+def fetch_chapter_body(url, timeout=10):
+    """下载一章的原始页面（先查缓存，配置了镜像时出错换镜像），下一章预取也用它"""
+    body = fresh_cached(url, CHAPTER_MAX_AGE)
+    if body is None:
+        body = mirror_pool.fetch(url, lambda mirror_url: cached_get(
+            mirror_url, timeout=timeout, max_age=CHAPTER_MAX_AGE, cache_key=url))
+    return body
+
+def get_chapter(url, chapter_num, policy=fetch_policy, timeout=10, log_func=None, stop_flag=None, pacer=None,
+                backend=None):
+    """同步下载并解析一章；pacer 为 AdaptiveDelay 时把每次请求的结果报告给它，backend 为解析后端（默认 lxml）
+
+    配置了镜像时出错会换镜像重试（同步版只做故障切换，不做对冲）；
+    传入 stop_flag 时请求在守护线程里进行，要停止时不必等它超时
+    """
+    def attempt():
+        try:
+            body = call_abortable(fetch_chapter_body, stop_flag, url, timeout)
+        except RetryCancelled:
+            raise
+        except Exception as e:
+            if pacer:
+                pacer.record(classify_error(e))
+            raise
+        if pacer:
+            pacer.record(OK)
+        return parse_chapter(body, chapter_num, backend=backend)
+
+    def on_retry(attempt_no, e, delay):
+        if log_func:
+            log_func(f"⚠️ 第 {attempt_no} 次尝试失败：{e}，{delay:.1f}s 后重试")
+
+    try:
+        return policy.run(attempt, stop_flag=stop_flag, on_retry=on_retry, url=url)
+    except RetryCancelled:
+        if log_func:
+            log_func(f"⏹️ 停止爬取，跳过第{chapter_num}章")
+    except Exception as e:
+        if log_func:
+            log_func(f"❌ 第{chapter_num}章 放弃重试：{e}")
+    return None, None, None, None
+
+def save_to_txt(output_file, title, content, index=None, chapter_num=None):
+    """追加一章（每次重新打开文件）；传入 index（ChapterIndexWriter）时同时记下这一章的偏移
+
+    下载整本书时用 output_sinks.open_sink，整个过程只打开一次文件，也能输出压缩文本和 EPUB
+    """
+    data = f"{title}\n\n{content}\n\n".encode("utf-8")
+    with WRITE_SECONDS.time(stage="write"), open(output_file, "ab") as f:
+        offset = f.tell()
+        f.write(data)
+    if index is not None:
+        index.add([(chapter_num, offset, len(data))])
+
+async def crawl_book(book_name, author_name, output_file, log_func, progress_func=None, total_func=None,
+                     window_func=None, stop_flag=None, concurrency=DEFAULT_CONCURRENCY, resume=True,
+                     journal_path=DEFAULT_JOURNAL, update=False, session=None, limiter=None,
+                     parse_workers=DEFAULT_PARSE_WORKERS, parse_batch=DEFAULT_BATCH_SIZE, parser=None, store=None,
+                     reading=None, parser_backend=None):
+    """搜索并下载一本书，返回 (是否成功, 结束信息)
+
+    单本下载（CrawlerThread）和批量队列（batch_queue）共用；批量时多本书传入同一个
+    session、limiter 和 parser（ParsePool），共享连接数上限、并发窗口和解析进程。
+    parse_workers 大于 0 且没有传入 parser 时自己开一个解析进程池。搜索、目录等同步请求放到线程里执行，
+    要停止时不等它们结束。传入 store（ChapterStore）时章节同时存进本地书库，库里已有的章节不再下载；
+    传入 reading（ReadingSession）时阅读位置附近的章节优先下载，下载期间可以随时读取已完成的章节；
+    parser_backend 为章节页的解析后端（"lxml" / "bs4"，默认 lxml），传入的 parser 按它自己的后端解析
+    """
+    if update and not sink_class(output_file).appendable:
+        return False, f"{output_file} 的格式不支持增量更新，请重新下载整本书"
+    if not update:
+        reset_output(output_file)
+
+    log_func(f"开始搜索小说《{book_name}》 作者：{author_name}")
+
+    try:
+        first_chapter_url = await run_abortable(get_best_match_first_chapter, stop_flag, book_name, author_name, log_func)
+        book_url = re.sub(r"/\d+\.html$", "/", first_chapter_url) if first_chapter_url else None
+        catalog = await run_abortable(get_catalog, stop_flag, book_url, log_func) if book_url else []
+    except RetryCancelled:
+        log_func("⏹️ 用户停止了爬取")
+        return False, "用户停止了爬取"
+    if not first_chapter_url:
+        if total_func:
+            total_func(0)  # 通知界面总章节为0
+        return False, "未找到小说章节起始链接，程序退出。"
+
+    all_chapters = [(idx, url) for idx, url, _ in catalog]
+    # 整本目录一次性编号（中文序号表也一并建好），章节页没有标题时用目录里的章节名
+    titles = renumber_catalog(catalog)
+
+    if not all_chapters:
+        return False, "未能获取章节列表"
+    first_index = 1
+    if update:
+        last_index, _ = last_saved_chapter(output_file, extract_chapter_number, book_url)
+        first_index = last_index + 1
+        all_chapters = [(idx, url) for idx, url in all_chapters if idx > last_index]
+        log_func(f"🔄 更新模式：已保存到第 {last_index} 章，新增 {len(all_chapters)} 章")
+        if not all_chapters:
+            if total_func:
+                total_func(0)
+            return True, "已是最新，无需更新"
+    if total_func:
+        total_func(len(all_chapters))  # 发送总章节数
+
+    journal = ChapterJournal(journal_path)
+    if not resume:
+        journal.forget(book_url)
+    saved, missing = split_resumable(journal, book_url, all_chapters)
+    if saved:
+        log_func(f"♻️ 断点日志中已有 {len(saved)} 章，本次只需下载 {len(missing)} 章")
+    stored = set()
+    if store is not None:
+        store.add_book(book_url, book_name, author_name)
+        if resume:
+            stored, missing = split_resumable(store, book_url, missing)
+        if stored:
+            log_func(f"📚 本地书库中已有 {len(stored)} 章，本次只需下载 {len(missing)} 章")
+
+    chapter_urls = dict(all_chapters)
+
+    def record_chapters(rows):
+        journal.record(book_url, [
+            (idx, chapter_urls[idx], title, content, offset, length)
+            for idx, title, content, offset, length in rows
+        ])
+        if store is not None:
+            store.record(book_url, [(idx, chapter_urls[idx], title, content) for idx, title, content, _, _ in rows])
+        last_idx = rows[-1][0]
+        save_meta(output_file, book_url, last_idx, chapter_urls[last_idx])
+
+    def hold_chapters(rows):
+        # 停止时缺口后面的章节：没写进文件，只记进日志和书库（偏移记为 -1），meta 也不往后推
+        journal.record(book_url, [(idx, chapter_urls[idx], title, content, -1, 0) for idx, title, content in rows])
+        if store is not None:
+            store.record(book_url, [(idx, chapter_urls[idx], title, content) for idx, title, content in rows])
+
+    def load_saved(idx):
+        if idx in saved:
+            return journal.load(book_url, idx)
+        return store.load(book_url, idx) if idx in stored else None
+
+    def on_window_change(window, direction):
+        if window_func:
+            window_func(window)
+        # 窗口收缩必报；增长时每 10 个报一次，避免刷屏
+        if direction == "decrease":
+            log_func(f"🚦 站点响应变慢或限流，并发窗口降到 {window}")
+        elif window % 10 == 0:
+            log_func(f"🚦 并发窗口升到 {window}")
+
+    if limiter is None:
+        limiter = AdaptiveLimiter(maximum=concurrency, on_change=on_window_change)
+    if window_func:
+        window_func(limiter.current())
+
+    # 整本书的下载交给 asyncio 引擎；章节凑齐一段就顺序写入文件，不再整本缓存在内存里
+    sink = open_sink(output_file, append=True, title=book_name, author=author_name)
+    writer = OrderedChapterWriter(output_file, first_index=first_index, on_flush=record_chapters, sink=sink,
+                                  on_hold=hold_chapters)
+    if reading is not None:
+        reading.attach(book_url, journal_path, writer)
+    own_parser = None
+    if parser is None and parse_workers > 0:
+        parser = own_parser = ParsePool(parse_workers, parse_batch, parser_backend)
+        log_func(f"🧩 解析交给 {parse_workers} 个进程，每批 {parse_batch} 页")
+    if parser is not None:
+        async def parse(body, idx):
+            return finish_chapter(await parser.extract(body), idx, titles)
+    else:
+        parse = lambda body, idx: parse_chapter(body, idx, titles, parser_backend)
+    try:
+        await crawl_chapters(
+            all_chapters, parse, headers, log_func, writer,
+            progress_func=progress_func,
+            concurrency=concurrency,
+            stop_flag=stop_flag,
+            saved_func=load_saved,
+            limiter=limiter,
+            policy=fetch_policy,
+            session=session,
+            reading=reading,
+        )
+    finally:
+        writer.close()
+        journal.close()
+        get_cache().flush()
+        if own_parser:
+            own_parser.close()
+
+    if stop_flag and stop_flag():
+        log_func(f"\n⏹️ 用户停止了爬取，已保存至：{output_file}")
+        return False, "用户停止了爬取"
+    log_func(f"\n✅ 异步并发爬取完成，小说保存至：{output_file}")
+    return True, "爬取完成"
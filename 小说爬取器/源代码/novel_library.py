@@ -0,0 +1,77 @@
+import argparse
+import sys
+import time
+from chapter_store import DEFAULT_LIBRARY, ChapterStore
+
+# ---------- 本地书库查询 ----------
+# 下载时加 --library 存进书库的书，可以在这里全文搜索、列出和离线导出，都不联网
+# 用法：python -m novel_library search 关键词 [关键词 ...] [-b 书名] [-n 20]
+#       python -m novel_library books
+#       python -m novel_library export 书名 [-o 输出.txt]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m novel_library", description="本地书库：全文搜索和离线导出")
+    parser.add_argument("--library", default=DEFAULT_LIBRARY, help="书库文件")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="全文搜索章节，多个关键词要同时出现")
+    search.add_argument("terms", nargs="+", help="关键词")
+    search.add_argument("-b", "--book", help="只搜这本书（书名或书籍URL）")
+    search.add_argument("-n", "--limit", type=int, default=20, help="最多显示的结果数")
+
+    commands.add_parser("books", help="列出书库里的书")
+
+    export = commands.add_parser("export", help="把书库里的一本书导出成 .txt，不联网")
+    export.add_argument("book", help="书名或书籍URL")
+    export.add_argument("-o", "--output", help="输出文件，默认为 书名.txt")
+    return parser.parse_args(argv)
+
+
+def find_book(store, name):
+    book = store.find_book(name)
+    if book is None:
+        print(f"书库里没有《{name}》", file=sys.stderr)
+    return book
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = ChapterStore(args.library)
+    try:
+        if args.command == "search":
+            book_url = None
+            if args.book:
+                book = find_book(store, args.book)
+                if book is None:
+                    return 1
+                book_url = book["book_url"]
+            start = time.perf_counter()
+            hits = store.search(" ".join(args.terms), book_url=book_url, limit=args.limit)
+            elapsed = (time.perf_counter() - start) * 1000
+            for hit in hits:
+                print(f"《{hit['book']}》 {hit['title']}\n    {hit['snippet']}\n    {hit['url']}")
+            print(f"找到 {len(hits)} 条（{elapsed:.1f} ms）", file=sys.stderr)
+            return 0 if hits else 1
+
+        if args.command == "books":
+            for book in store.books():
+                updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(book["updated_at"]))
+                author = f"（{book['author']}）" if book["author"] not in ("", "no") else ""
+                print(f"《{book['title']}》{author} {book['chapters']} 章  {updated}  {book['book_url']}")
+            print(store.summary(), file=sys.stderr)
+            return 0
+
+        book = find_book(store, args.book)
+        if book is None:
+            return 1
+        output = args.output or f"{book['title']}.txt"
+        count = store.export(book["book_url"], output)
+        print(f"✅ 已从书库导出 {count} 章：{output}", file=sys.stderr)
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+from chapter_index import index_path
+from output_sinks import read_text
+
+# ---------- 增量更新：只下载已保存章节之后的新章节 ----------
+# 每次写入章节后在输出文件旁边维护一个 .meta.json（书籍URL、最后一章序号和URL）；
+# 没有 meta 时退回到扫描 .txt 里最后一个章节标题
+
+META_SUFFIX = ".meta.json"
+
+
+def meta_path(output_file):
+    return output_file + META_SUFFIX
+
+
+def load_meta(output_file):
+    try:
+        with open(meta_path(output_file), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_meta(output_file, book_url, last_index, last_url):
+    # 先写临时文件再替换，崩溃时不会留下半个 json
+    tmp = meta_path(output_file) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"book_url": book_url, "last_index": last_index, "last_url": last_url}, f, ensure_ascii=False)
+    os.replace(tmp, meta_path(output_file))
+
+
+def scan_last_index(output_file, extract_func):
+    """从 .txt 推算最后保存的章节序号；文件格式为 标题\n\n正文\n\n 交替
+
+    取“最后一个能识别的章节号”和“标题个数”中较大的一个：
+    标题都按序号重新编号过，个数不会超过真实序号，识别不出的标题也不会让结果偏小
+    """
+    if not os.path.exists(output_file):
+        return 0
+    blocks = read_text(output_file).split("\n\n")
+    titles = [t.strip() for t in blocks[0::2] if t.strip()]
+    for title in reversed(titles):
+        num = extract_func(title)
+        if num is not None:
+            return max(num, len(titles))
+    return len(titles)
+
+
+def last_saved_chapter(output_file, extract_func, book_url=None):
+    """返回 (最后保存的章节序号, 该章URL或None)"""
+    if not os.path.exists(output_file):
+        return 0, None
+    meta = load_meta(output_file)
+    if meta and (book_url is None or meta.get("book_url") == book_url):
+        return meta.get("last_index", 0), meta.get("last_url")
+    return scan_last_index(output_file, extract_func), None
+
+
+def reset_output(output_file):
+    """整本重新下载前清空输出文件，同时删掉旧的 meta 和章节索引；
+    否则这次没写到第一批就停下时，下次增量更新会读到旧的 last_index，索引的偏移也对不上"""
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("")
+    for sidecar in (meta_path, index_path):
+        if os.path.exists(sidecar(output_file)):
+            os.remove(sidecar(output_file))
+
+
+def move_with_meta(src, dst):
+    """移动小说文件时把 meta 和章节索引一起带走，下次才能继续增量更新"""
+    shutil.move(src, dst)
+    for sidecar in (meta_path, index_path):
+        if os.path.exists(sidecar(src)):
+            shutil.move(sidecar(src), sidecar(dst))
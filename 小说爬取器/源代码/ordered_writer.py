@@ -0,0 +1,92 @@
+import asyncio
+from metrics import WRITE_SECONDS
+from output_sinks import open_sink
+
+# ---------- 按章节顺序流式写盘 ----------
+# 章节乱序到达，只要凑齐下一章就立刻写入文件；乱序缓存的章节数有硬上限，
+# 超出窗口的章节在开始下载前就会被挡住（reserve），所以内存占用与书的长度无关。
+# 实际写入交给输出格式（output_sinks），纯文本时每批写完同时追加章节偏移索引（.idx）
+
+DEFAULT_CAPACITY = 256  # 最多缓存的乱序章节数
+
+
+class OrderedChapterWriter:
+    def __init__(self, output_file, first_index=1, capacity=DEFAULT_CAPACITY, mode="a", on_flush=None, index=True,
+                 sink=None, on_hold=None):
+        self.output_file = output_file
+        self.next_index = first_index  # 下一个要写入文件的章节序号
+        self.capacity = capacity
+        self.written = 0
+        # 每批写入落盘后回调 on_flush([(idx, title, content, offset, length), ...])，供断点日志记录
+        self.on_flush = on_flush
+        # 中途停止时缺口后面已下载的章节不写进文件，交给 on_hold([(idx, title, content), ...]) 另存
+        self.on_hold = on_hold
+        self._pending = {}  # idx -> (title, content)，None 表示该章失败被跳过
+        self._flushed = []
+        self._cond = asyncio.Condition()
+        self.sink = sink or open_sink(output_file, append=mode == "a", index=index)
+
+    async def reserve(self, idx, urgent=None):
+        """等到 idx 落入写入窗口 [next_index, next_index + capacity) 再开始下载
+
+        urgent(idx) 为真的章节（读者正在看的位置附近）不受窗口限制
+        """
+        async with self._cond:
+            await self._cond.wait_for(lambda: idx < self.next_index + self.capacity or (urgent and urgent(idx)))
+
+    async def wake(self):
+        """让等在 reserve() 里的章节重新检查条件（阅读位置变了）"""
+        async with self._cond:
+            self._cond.notify_all()
+
+    def peek(self, idx):
+        """已下载、还在乱序缓存里等前面章节的第 idx 章 (标题, 正文)，没有时返回 None"""
+        return self._pending.get(idx)
+
+    async def put(self, idx, title, content):
+        async with self._cond:
+            self._pending[idx] = (title, content)
+            self._drain()
+            self._cond.notify_all()
+
+    async def skip(self, idx):
+        """该章获取失败，不再等待它，后续章节照常写入"""
+        async with self._cond:
+            self._pending[idx] = None
+            self._drain()
+            self._cond.notify_all()
+
+    def _drain(self):
+        while self.next_index in self._pending:
+            chapter = self._pending.pop(self.next_index)
+            if chapter is not None:
+                self._write(self.next_index, *chapter)
+            self.next_index += 1
+        self._flush()
+
+    def _write(self, idx, title, content):
+        offset, length = self.sink.write(idx, title, content)
+        self._flushed.append((idx, title, content, offset, length))
+        self.written += 1
+
+    def _flush(self):
+        # 先把文件内容落盘，再通知日志，保证日志记录的偏移一定有对应的数据
+        if self._flushed:
+            self.sink.flush()
+            if self.on_flush:
+                with WRITE_SECONDS.time(stage="journal"):
+                    self.on_flush(self._flushed)
+            self._flushed = []
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def close(self):
+        # 中途停止时文件只写到第一个缺口为止：缺口后面的章节要是也写进去，增量更新会以为缺的章节已经保存过。
+        # 已下载但没凑齐的章节交给 on_hold（记进断点日志），下次续爬时直接取用，不用重新下载
+        self._flush()
+        held = [(idx, *chapter) for idx, chapter in sorted(self._pending.items()) if chapter is not None]
+        if held and self.on_hold:
+            self.on_hold(held)
+        self._pending.clear()
+        self.sink.close()
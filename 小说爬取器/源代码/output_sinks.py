@@ -0,0 +1,247 @@
+import gzip
+import html
+import os
+import time
+import uuid
+import zipfile
+from chapter_index import ChapterIndexWriter
+from metrics import WRITE_SECONDS
+
+try:
+    import zstandard
+except ImportError:  # 只有保存成 .zst 时才需要
+    zstandard = None
+
+# ---------- 输出格式 ----------
+# 整本书下载期间只打开一次输出文件，章节到达就写进去：
+#   .txt       纯文本（标题\n\n正文\n\n），同时追加章节偏移索引 .idx
+#   .txt.gz    gzip 流式压缩；.txt.zst 为 zstd（需要 pip install zstandard），解压后与 .txt 相同
+#   .epub      EPUB 3，每章到达就写进压缩包，结束时补上目录和元数据
+# 按输出文件的扩展名选择格式。每批章节写完调用 flush()：压缩流做一次同步刷新（不丢压缩字典，
+# 压缩率几乎不受影响），保证断点日志和 meta 记下的章节都已经在磁盘上
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+FORMATS = {"txt": ".txt", "gz": ".txt.gz", "zst": ".txt.zst", "epub": ".epub"}  # 格式名 -> 扩展名
+
+
+class TextSink:
+    appendable = True  # 能否在已有文件后面追加（增量更新）
+
+    def __init__(self, output_file, append=False, index=True, **book):
+        self.output_file = output_file
+        self._file = open(output_file, "ab" if append else "wb")
+        self.offset = self._file.tell()  # 当前写入位置（字节）
+        self.index = ChapterIndexWriter(output_file) if index else None
+        self._entries = []
+
+    def write(self, idx, title, content):
+        """写入一章，返回 (偏移, 长度)"""
+        data = f"{title}\n\n{content}\n\n".encode("utf-8")
+        with WRITE_SECONDS.time(stage="write"):
+            self._file.write(data)
+        offset, self.offset = self.offset, self.offset + len(data)
+        self._entries.append((idx, offset, len(data)))
+        return offset, len(data)
+
+    def flush(self):
+        # 先把正文落盘再写索引，索引里的每一条在文件里一定有数据
+        with WRITE_SECONDS.time(stage="flush"):
+            self._file.flush()
+        if self.index and self._entries:
+            self.index.add(self._entries)
+        self._entries = []
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        if self.index:
+            self.index.close()
+
+
+class CompressedTextSink(TextSink):
+    """压缩的纯文本；偏移和长度按解压后的字节计算，不写 .idx（压缩流不能按偏移随机读取）"""
+
+    def __init__(self, output_file, append=False, index=True, **book):
+        super().__init__(output_file, append, index=False)
+        # 追加时接着写一个新的压缩帧，gzip 和 zstd 都把多个帧解压成连续的内容
+        self.offset = 0
+        self._stream = self._open_stream(self._file)
+
+    def _open_stream(self, raw):
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL, filename="")
+
+    def write(self, idx, title, content):
+        data = f"{title}\n\n{content}\n\n".encode("utf-8")
+        with WRITE_SECONDS.time(stage="write"):
+            self._stream.write(data)
+        offset, self.offset = self.offset, self.offset + len(data)
+        return offset, len(data)
+
+    def flush(self):
+        with WRITE_SECONDS.time(stage="flush"):
+            self._stream.flush()
+            self._file.flush()
+
+    def close(self):
+        self._stream.close()
+        self._file.close()
+
+
+class ZstdTextSink(CompressedTextSink):
+    def _open_stream(self, raw):
+        if zstandard is None:
+            raise RuntimeError("保存为 .zst 需要先安装 zstandard：pip install zstandard")
+        # flush() 刷出当前块，close() 结束整个帧；closefd=False 让底层文件由 TextSink 关闭
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+
+
+_CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+_CHAPTER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="zh-CN" lang="zh-CN">
+<head><meta charset="UTF-8"/><title>{title}</title><link rel="stylesheet" type="text/css" href="../style.css"/></head>
+<body>
+<h2>{title}</h2>
+{paragraphs}
+</body>
+</html>
+"""
+
+_STYLE = "body { line-height: 1.6; } h2 { text-align: center; } p { text-indent: 2em; margin: 0.3em 0; }\n"
+
+
+class EpubSink:
+    """EPUB 3：章节到达就写进 zip；目录（nav.xhtml、toc.ncx）和 content.opf 在 close() 时补上，
+    中途停止也会得到一本只含已下载章节的完整电子书。zip 的中央目录要到关闭时才写，所以不支持追加"""
+
+    appendable = False
+
+    def __init__(self, output_file, append=False, index=True, title="", author=""):
+        if append and os.path.exists(output_file) and os.path.getsize(output_file):
+            raise ValueError("EPUB 不支持增量更新，请重新下载整本书")
+        self.output_file = output_file
+        self.title = title or os.path.splitext(os.path.basename(output_file))[0]
+        self.author = author if author not in ("", "no") else ""
+        self._zip = zipfile.ZipFile(output_file, "w", zipfile.ZIP_DEFLATED)
+        # mimetype 必须是第一个文件并且不压缩
+        self._zip.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        self._zip.writestr("META-INF/container.xml", _CONTAINER)
+        self._zip.writestr("OEBPS/style.css", _STYLE)
+        self._chapters = []  # [(章节序号, 文件名, 标题), ...]，按写入顺序
+        self.offset = 0
+
+    def write(self, idx, title, content):
+        name = f"chapters/c{idx:05d}.xhtml"
+        paragraphs = "\n".join(f"<p>{html.escape(line)}</p>" for line in content.split("\n") if line.strip())
+        data = _CHAPTER.format(title=html.escape(title), paragraphs=paragraphs).encode("utf-8")
+        with WRITE_SECONDS.time(stage="write"):
+            self._zip.writestr("OEBPS/" + name, data)
+        self._chapters.append((idx, name, title))
+        offset, self.offset = self.offset, self.offset + len(data)
+        return offset, len(data)
+
+    def flush(self):
+        with WRITE_SECONDS.time(stage="flush"):
+            self._zip.fp.flush()
+
+    def close(self):
+        # 目录按章节序号排列
+        chapters = sorted(self._chapters)
+        book_id = f"urn:uuid:{uuid.uuid4()}"
+        title, author = html.escape(self.title), html.escape(self.author)
+        modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        manifest = "\n".join(f'    <item id="c{idx}" href="{name}" media-type="application/xhtml+xml"/>'
+                             for idx, name, _ in chapters)
+        spine = "\n".join(f'    <itemref idref="c{idx}"/>' for idx, _, _ in chapters)
+        creator = f"\n    <dc:creator>{author}</dc:creator>" if author else ""
+        self._zip.writestr("OEBPS/content.opf", f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="zh-CN">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="book-id">{book_id}</dc:identifier>
+    <dc:title>{title}</dc:title>{creator}
+    <dc:language>zh-CN</dc:language>
+    <meta property="dcterms:modified">{modified}</meta>
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="style" href="style.css" media-type="text/css"/>
+{manifest}
+  </manifest>
+  <spine toc="ncx">
+{spine}
+  </spine>
+</package>
+""")
+        links = "\n".join(f'      <li><a href="{name}">{html.escape(t)}</a></li>' for _, name, t in chapters)
+        self._zip.writestr("OEBPS/nav.xhtml", f"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="zh-CN">
+<head><meta charset="UTF-8"/><title>{title}</title></head>
+<body>
+  <nav epub:type="toc" id="toc">
+    <h1>{title}</h1>
+    <ol>
+{links}
+    </ol>
+  </nav>
+</body>
+</html>
+""")
+        # EPUB 2 阅读器只认 toc.ncx
+        points = "\n".join(
+            f'    <navPoint id="p{idx}" playOrder="{order}"><navLabel><text>{html.escape(t)}</text></navLabel>'
+            f'<content src="{name}"/></navPoint>'
+            for order, (idx, name, t) in enumerate(chapters, 1)
+        )
+        self._zip.writestr("OEBPS/toc.ncx", f"""<?xml version="1.0" encoding="UTF-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+  <head><meta name="dtb:uid" content="{book_id}"/></head>
+  <docTitle><text>{title}</text></docTitle>
+  <navMap>
+{points}
+  </navMap>
+</ncx>
+""")
+        self._zip.close()
+
+
+def sink_class(output_file):
+    """按扩展名选择输出格式"""
+    name = output_file.lower()
+    if name.endswith(".gz"):
+        return CompressedTextSink
+    if name.endswith(".zst"):
+        return ZstdTextSink
+    if name.endswith(".epub"):
+        return EpubSink
+    return TextSink
+
+
+def open_sink(output_file, append=False, index=True, title="", author=""):
+    return sink_class(output_file)(output_file, append=append, index=index, title=title, author=author)
+
+
+def read_text(output_file):
+    """读出 .txt / .txt.gz / .txt.zst 的全部文字（增量更新扫描已保存的章节时用）"""
+    cls = sink_class(output_file)
+    if cls is CompressedTextSink:
+        with gzip.open(output_file, "rt", encoding="utf-8") as f:
+            return f.read()
+    if cls is ZstdTextSink:
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 需要先安装 zstandard：pip install zstandard")
+        with open(output_file, "rb") as f:
+            return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True).read().decode("utf-8")
+    if cls is EpubSink:
+        raise ValueError("EPUB 不支持增量更新，请重新下载整本书")
+    with open(output_file, "r", encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from chapter_parser import extract_many, get_backend
+from metrics import PARSE_SECONDS
+
+# ---------- 多进程解析 ----------
+# 网络 I/O 留在事件循环里，只返回原始字节；解析交给 ProcessPoolExecutor，不再受 GIL 限制只用一个核。
+# 待解析的页面先攒成一批（batch_size 页，或最多等 LINGER 秒）再一起送进子进程，减少进程间通信的开销
+
+DEFAULT_PARSE_WORKERS = 0  # 0 表示不开进程池，在事件循环里直接解析
+DEFAULT_BATCH_SIZE = 8
+LINGER = 0.002  # 凑不满一批时最多等多久就送出（秒）
+
+
+class ParsePool:
+    """async with ParsePool(workers=8) as pool: raw_title, content, next_href = await pool.extract(body)"""
+
+    def __init__(self, workers, batch_size=DEFAULT_BATCH_SIZE, backend=None):
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        self.backend = backend or get_backend()
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._pending = []  # [(页面字节, 等待结果的 future), ...]
+        self._timer = None
+
+    async def extract(self, body):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((body, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(LINGER, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        done = asyncio.wrap_future(self._executor.submit(extract_many, [body for body, _ in batch], self.backend))
+        done.add_done_callback(lambda f: self._deliver(batch, f))
+
+    def _deliver(self, batch, done):
+        if done.cancelled() or done.exception() is not None:
+            error = done.exception() if not done.cancelled() else asyncio.CancelledError()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), (result, seconds) in zip(batch, done.result()):
+            PARSE_SECONDS.observe(seconds, backend=self.backend)
+            if future.done():  # 等待的一方已被取消
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+        return False
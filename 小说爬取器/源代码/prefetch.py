@@ -0,0 +1,105 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from cancellation import STOP_POLL_INTERVAL
+from metrics import PREFETCHES
+
+# ---------- 顺序爬取的下一章预取 ----------
+# main.py 沿“下一章”链接一章一章地爬，每章都要等一个完整的往返。这个站点的章节 URL 基本是连续的数字，
+# 所以解析出真正的下一章链接后，就按最近一次的步长往后猜 depth 章，在后台线程里先下载进 HTTP 缓存。
+# 主线程照旧沿链接前进：猜对的章节直接从缓存取；下一章链接和猜测对不上时，猜错的预取全部丢掉，
+# 从真正的链接重新猜。写盘顺序始终跟着“下一章”链接走。
+# 命中率只统计按步长猜出来的章节（下一章之后的第 2 章起）：已知的下一章链接本来就知道，不算猜中
+
+DEFAULT_DEPTH = 4  # 往后预取的章数，也是后台下载线程数
+
+_CHAPTER_ID = re.compile(r"/(\d+)\.html$")
+
+
+def chapter_id(url):
+    match = _CHAPTER_ID.search(url or "")
+    return int(match.group(1)) if match else None
+
+
+def with_chapter_id(url, number):
+    return _CHAPTER_ID.sub(f"/{number}.html", url)
+
+
+class ChapterPrefetcher:
+    def __init__(self, fetch_func, depth=DEFAULT_DEPTH):
+        self.fetch_func = fetch_func  # fetch_func(url) 下载一章并放进缓存
+        self.depth = depth
+        self.stride = 1  # 最近一次“本章 → 下一章”的编号差
+        self._pool = ThreadPoolExecutor(max_workers=depth, thread_name_prefix="prefetch")
+        self._futures = {}  # url -> (Future, 是否为按步长猜出来的)
+        self._lock = threading.Lock()
+        self.hits = 0  # 按步长提前猜中、主线程到达时已经开始下载的章节
+        self.misses = 0  # 没猜中，只能从已知的下一章链接开始下载的章节
+        self.wasted = 0  # 猜错、已经下载了又丢掉的预取
+
+    def predict(self, next_url):
+        """从确定的下一章链接出发，按步长往后猜，共 depth 个 URL"""
+        if not next_url or not next_url.endswith(".html"):
+            return []
+        start = chapter_id(next_url)
+        if start is None:
+            return [next_url]
+        return [next_url] + [with_chapter_id(next_url, start + self.stride * k) for k in range(1, self.depth)]
+
+    def wait(self, url, stop_flag=None):
+        """主线程下载 url 之前调用：有这一章的预取就等它下载完，返回正文是否已在缓存里
+
+        等待期间 stop_flag() 为真就不再等，返回 False。第一章之前还没有任何预取，不计入命中率
+        """
+        with self._lock:
+            future, speculative = self._futures.pop(url, (None, False))
+        if future is None:
+            return False
+        ready = False
+        while not future.cancelled():
+            try:
+                future.result(timeout=STOP_POLL_INTERVAL)
+                ready = True
+            except TimeoutError:
+                if stop_flag and stop_flag():
+                    return False
+                continue
+            except Exception:
+                pass  # 预取失败就由主线程正常下载、重试
+            break
+        hit = ready and speculative
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        PREFETCHES.inc(outcome="hit" if hit else "miss")
+        return ready
+
+    def advance(self, url, next_url):
+        """url 解析完、拿到真正的下一章链接后调用：丢掉对不上的预取，从 next_url 往后再猜"""
+        current, following = chapter_id(url), chapter_id(next_url)
+        if current is not None and following is not None and following > current:
+            self.stride = following - current
+        predictions = self.predict(next_url)
+        with self._lock:
+            for stale in [u for u in self._futures if u not in predictions]:
+                future, _ = self._futures.pop(stale)
+                # 还没开始的直接取消；已经发出的请求只能作废
+                if not future.cancel():
+                    self.wasted += 1
+                    PREFETCHES.inc(outcome="wasted")
+            for predicted in predictions:
+                if predicted not in self._futures:
+                    # 已知的下一章也提前发出，但只有第一次就是猜出来的章节才算猜中
+                    self._futures[predicted] = (self._pool.submit(self.fetch_func, predicted), predicted != next_url)
+
+    def close(self):
+        with self._lock:
+            self._futures.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"🔮 预取：按步长猜中 {self.hits} 章，没猜中 {self.misses} 章（命中率 {rate:.0f}%），猜错作废 {self.wasted} 个"
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+from metrics import RATE_WAIT
+
+# ---------- 按站点的令牌桶限速 ----------
+# 每个 host 一个令牌桶：每秒补充 rate 个令牌，最多攒 burst 个。所有线程和协程共用同一个桶，
+# 取令牌时先“预约”（令牌可以透支成负数），算出需要等待的时间，再在锁外 sleep，
+# 这样多线程 / asyncio 下总请求速率都被真正限制住，而且先到先得
+
+DEFAULT_RATE = 50.0  # 每秒请求数
+DEFAULT_BURST = 100
+
+
+class TokenBucket:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        # 等待时间统计
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self):
+        """占一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._overrides = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host, rate, burst=None):
+        """单独设置某个站点的速率，已有的桶会被替换"""
+        with self._lock:
+            self._overrides[host] = (rate, burst if burst is not None else max(1, int(rate)))
+            self._buckets.pop(host, None)
+
+    @staticmethod
+    def host(url_or_host):
+        return urlsplit(url_or_host).hostname if "//" in url_or_host else url_or_host
+
+    def bucket(self, url_or_host):
+        host = self.host(url_or_host)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self._overrides.get(host, (self.rate, self.burst))
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def acquire(self, url):
+        wait = self.bucket(url).acquire()
+        RATE_WAIT.observe(wait, host=self.host(url))
+        return wait
+
+    async def acquire_async(self, url):
+        wait = await self.bucket(url).acquire_async()
+        RATE_WAIT.observe(wait, host=self.host(url))
+        return wait
+
+    def stats(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {
+            host: {
+                "requests": b.acquired,
+                "waited": b.waited,
+                "total_wait": round(b.total_wait, 3),
+                "max_wait": round(b.max_wait, 3),
+            }
+            for host, b in buckets.items()
+        }
+
+    def summary(self):
+        lines = [
+            f"⏳ 限速 {host}：请求 {s['requests']} 次，其中等待 {s['waited']} 次，"
+            f"累计等待 {s['total_wait']:.2f}s，最长 {s['max_wait']:.2f}s"
+            for host, s in self.stats().items()
+        ]
+        return "\n".join(lines) if lines else "⏳ 限速：没有发出请求"
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,89 @@
+import threading
+from checkpoint import ChapterJournal
+
+# ---------- 边下边读：阅读位置优先 ----------
+# 读者翻到第 N 章时调用 focus(N)：N 往后 PRIORITY_AHEAD 章（和往前 PRIORITY_BEHIND 章）插到队首，
+# 不受写入窗口限制，排队等并发名额时也排在其他章节前面；其余章节照旧按顺序下载。
+# 已下载的章节随时可以用 chapter(N) 取：还在乱序缓存里的直接从内存取，已经写盘的从断点日志读，
+# 所以整本书没下完、前面的章节还没凑齐时也能先看后面的章节
+
+PRIORITY_AHEAD = 20  # 阅读位置往后优先下载的章数（含当前章）
+PRIORITY_BEHIND = 2  # 往前优先下载的章数，方便往回翻
+
+
+class ReadingSession:
+    """一本书的阅读位置和已下载章节的读取入口；focus() 和 chapter() 可以在界面线程里调用"""
+
+    def __init__(self, position=None, ahead=PRIORITY_AHEAD, behind=PRIORITY_BEHIND):
+        self.position = position
+        self.ahead = ahead
+        self.behind = behind
+        self._lock = threading.Lock()
+        self._listeners = []  # [(事件循环, 回调)]，阅读位置变化时在事件循环里调用
+        self._book_url = None
+        self._journal_path = None
+        self._writer = None
+        self._journals = threading.local()  # 每个读取线程自己的 SQLite 连接
+        self.finished = False  # 下载已经结束（完成或停止），还没下载到的章节不会再来了
+
+    # ---------- 调度 ----------
+    def focus(self, idx):
+        """把阅读位置移到第 idx 章，附近的章节马上插到队首"""
+        with self._lock:
+            self.position = idx
+            listeners = list(self._listeners)
+        for loop, callback in listeners:
+            try:
+                loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                pass  # 事件循环已经结束
+
+    def rank(self, idx):
+        """排队顺序，越小越先下载：阅读位置往后按距离，再是往前几章，其余按章节顺序"""
+        p = self.position
+        if p is not None:
+            if p <= idx < p + self.ahead:
+                return 0, idx - p
+            if p - self.behind <= idx < p:
+                return 0, self.ahead + p - idx
+        return 1, idx
+
+    def is_priority(self, idx):
+        return self.rank(idx)[0] == 0
+
+    def subscribe(self, loop, callback):
+        with self._lock:
+            self._listeners.append((loop, callback))
+
+    def unsubscribe(self, loop, callback):
+        with self._lock:
+            if (loop, callback) in self._listeners:
+                self._listeners.remove((loop, callback))
+
+    # ---------- 读取 ----------
+    def attach(self, book_url, journal_path, writer):
+        """crawl_book 开始下载时调用，之后 chapter() 才能取到内容"""
+        self._book_url, self._journal_path, self._writer = book_url, journal_path, writer
+
+    def chapter(self, idx):
+        """已下载的第 idx 章 (标题, 正文)，还没下载完时返回 None"""
+        if self._writer is None:
+            return None
+        pending = self._writer.peek(idx)
+        if pending:
+            return pending
+        journal = getattr(self._journals, "journal", None)
+        if journal is None or journal.path != self._journal_path:
+            journal = self._journals.journal = ChapterJournal(self._journal_path)
+        return journal.load(self._book_url, idx)
+
+    def finish(self):
+        """下载结束时调用：之后 chapter() 取不到的章节就是没有下载到"""
+        self.finished = True
+
+    def close(self):
+        """关闭当前线程打开的断点日志连接"""
+        journal = getattr(self._journals, "journal", None)
+        if journal is not None:
+            journal.close()
+            self._journals.journal = None
@@ -0,0 +1,176 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from metrics import RETRIES, host_of
+
+try:
+    import aiohttp
+    _NETWORK_ERRORS = (requests.ConnectionError, ConnectionError, aiohttp.ClientConnectionError,
+                       aiohttp.ClientPayloadError)
+except ImportError:  # 电影爬取器只用 requests
+    _NETWORK_ERRORS = (requests.ConnectionError, ConnectionError)
+
+# ---------- 通用重试策略 ----------
+# 先按异常判断原因：404 这类客户端错误直接放弃；429、5xx、超时、断连按指数退避 + 全抖动重试，
+# 响应带 Retry-After 时至少等到它要求的时间；每个 URL 有总时限，超过就不再重试。
+# 各原因的重试次数和放弃次数记在 retry_stats 里，爬完后输出
+
+THROTTLED = "throttled"  # 429
+SERVER = "server"  # 5xx
+TIMEOUT = "timeout"
+NETWORK = "network"  # 连接失败、连接被断开
+CLIENT = "client"  # 其余 4xx：重试也没用
+OTHER = "other"  # 解析失败等，可能是站点临时返回了残缺页面
+
+RETRYABLE = {THROTTLED, SERVER, TIMEOUT, NETWORK, OTHER}
+CAUSE_NAMES = {THROTTLED: "429", SERVER: "5xx", TIMEOUT: "超时", NETWORK: "连接失败",
+               CLIENT: "4xx", OTHER: "其他"}
+
+
+class RetryCancelled(Exception):
+    """stop_flag 要求停止时抛出"""
+
+
+def _status(exc):
+    status = getattr(exc, "status", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def classify(exc):
+    status = _status(exc)
+    if status is not None:
+        if status == 429:
+            return THROTTLED
+        if status >= 500:
+            return SERVER
+        return TIMEOUT if status == 408 else CLIENT
+    # ConnectTimeout 同时是 ConnectionError，先判断超时
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, requests.Timeout)):
+        return TIMEOUT
+    if isinstance(exc, _NETWORK_ERRORS):
+        return NETWORK
+    return OTHER
+
+
+def retry_after(exc):
+    """从 429/503 响应的 Retry-After 取出需要等待的秒数，没有或无法解析时返回 None"""
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = {}  # 原因 -> 重试次数
+        self.gave_up = {}  # 原因 -> 放弃的 URL 数
+
+    def on_retry(self, cause):
+        with self._lock:
+            self.retries[cause] = self.retries.get(cause, 0) + 1
+
+    def on_give_up(self, cause):
+        with self._lock:
+            self.gave_up[cause] = self.gave_up.get(cause, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"retries": dict(self.retries), "gave_up": dict(self.gave_up)}
+
+    def summary(self):
+        s = self.snapshot()
+        if not s["retries"] and not s["gave_up"]:
+            return "🔁 重试：没有失败的请求"
+        retries = "、".join(f"{CAUSE_NAMES[c]} {n} 次" for c, n in s["retries"].items()) or "无"
+        gave_up = "、".join(f"{CAUSE_NAMES[c]} {n} 个" for c, n in s["gave_up"].items()) or "无"
+        return f"🔁 重试：{retries}；放弃：{gave_up}"
+
+
+retry_stats = RetryStats()
+
+
+class RetryPolicy:
+    def __init__(self, attempts=4, base_delay=0.5, max_delay=30.0, deadline=60.0, stats=None):
+        self.attempts = attempts  # 总尝试次数（含第一次）
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline  # 单个 URL 从第一次请求起的总时限（秒）
+        self.stats = stats or retry_stats
+
+    def next_delay(self, attempt, exc, elapsed, url=None):
+        """第 attempt 次（从 1 起）失败后应等待的秒数，返回 None 表示放弃"""
+        cause = classify(exc)
+        if cause not in RETRYABLE or attempt >= self.attempts:
+            self.stats.on_give_up(cause)
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hint = retry_after(exc)
+        if hint is not None:
+            delay = max(delay, hint)
+        if elapsed + delay > self.deadline:
+            self.stats.on_give_up(cause)
+            return None
+        self.stats.on_retry(cause)
+        RETRIES.inc(host=host_of(url) if url else "", cause=cause)
+        return delay
+
+    def run(self, func, stop_flag=None, on_retry=None, url=None):
+        """同步调用 func()，失败按策略重试；放弃时抛出最后一次的异常
+
+        on_retry(第几次, 异常, 等待秒数) 在每次决定重试时调用，可用来写日志；
+        url 只用于按 host 统计重试次数
+        """
+        start = time.monotonic()
+        for attempt in range(1, self.attempts + 1):
+            if stop_flag and stop_flag():
+                raise RetryCancelled()
+            try:
+                return func()
+            except RetryCancelled:
+                raise
+            except Exception as e:
+                delay = self.next_delay(attempt, e, time.monotonic() - start, url)
+                if delay is None:
+                    raise
+                if on_retry:
+                    on_retry(attempt, e, delay)
+            # 分段睡眠，停止时能及时退出
+            wake = time.monotonic() + delay
+            while time.monotonic() < wake:
+                if stop_flag and stop_flag():
+                    raise RetryCancelled()
+                time.sleep(max(0.0, min(0.2, wake - time.monotonic())))
+
+    async def run_async(self, func, stop_flag=None, on_retry=None, url=None):
+        """run() 的协程版本，func 为返回协程的函数"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for attempt in range(1, self.attempts + 1):
+            if stop_flag and stop_flag():
+                raise RetryCancelled()
+            try:
+                return await func()
+            except RetryCancelled:
+                raise
+            except Exception as e:
+                delay = self.next_delay(attempt, e, loop.time() - start, url)
+                if delay is None:
+                    raise
+                if on_retry:
+                    on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+# 测试直接 import 上一级目录里的模块，和各个脚本的用法一致
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bench_site
+import novel_core
+from rate_limiter import rate_limiter
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """本地基准站点：novel_core 指向它，不限速；缓存、书目等数据库都建在临时目录里"""
+    monkeypatch.chdir(tmp_path)
+    rate_limiter.configure("127.0.0.1", 1e9, 1e9)
+    with bench_site.BenchSite(chapters=40, latency=0.0, size_kb=1) as s:
+        monkeypatch.setattr(novel_core, "base_url", s.url)
+        yield s
@@ -0,0 +1,38 @@
+import asyncio
+import bench_site
+import metrics
+import novel_cli
+import novel_core
+
+
+def parse_count(backend):
+    return sum(s["count"] for key, s in metrics.PARSE_SECONDS.snapshot().items() if backend in key)
+
+
+def test_cli_parser_option_switches_backend(site):
+    outputs = {}
+    for backend in ("lxml", "bs4"):
+        before = parse_count(backend)
+        rc = novel_cli.main([bench_site.BOOK_NAME, "-o", f"{backend}.txt", "--parser", backend, "--no-resume",
+                             "--journal", "journal.db", "--metrics-json", "", "-q"])
+        assert rc == 0
+        # 这次的章节确实是用指定的后端解析的
+        assert parse_count(backend) - before == site.chapters
+        with open(f"{backend}.txt", encoding="utf-8") as f:
+            outputs[backend] = f.read()
+    assert outputs["bs4"] == outputs["lxml"]
+
+
+def test_parse_pool_uses_requested_backend(site):
+    before = parse_count("bs4")
+    ok, message = asyncio.run(novel_core.crawl_book(
+        bench_site.BOOK_NAME, "", "pool.txt", lambda msg: None, journal_path="journal.db", resume=False,
+        parse_workers=2, parser_backend="bs4"))
+    assert ok, message
+    assert parse_count("bs4") - before == site.chapters
+    ok, _ = asyncio.run(novel_core.crawl_book(
+        bench_site.BOOK_NAME, "", "inline.txt", lambda msg: None, journal_path="journal.db", resume=False,
+        parse_workers=0))
+    assert ok
+    with open("pool.txt", encoding="utf-8") as a, open("inline.txt", encoding="utf-8") as b:
+        assert a.read() == b.read()
@@ -0,0 +1,29 @@
+import random
+from prefetch import ChapterPrefetcher
+
+
+def walk(urls):
+    # 模拟 main.py：等预取、“下载”本章，再拿真正的下一章链接往前走
+    prefetcher = ChapterPrefetcher(lambda url: None, depth=4)
+    try:
+        for url, next_url in zip(urls, urls[1:] + [None]):
+            prefetcher.wait(url)
+            prefetcher.advance(url, next_url)
+    finally:
+        prefetcher.close()
+    return prefetcher
+
+
+def test_known_next_link_is_not_a_hit():
+    ids = random.Random(1).sample(range(1000, 100000), 30)
+    prefetcher = walk([f"http://x/book/{n}.html" for n in ids])
+    # 章节编号没有规律，步长一次也猜不中；只是提前下载已知的下一章不算命中
+    assert prefetcher.hits == 0
+    assert prefetcher.misses == 29
+
+
+def test_stride_guesses_count_as_hits():
+    prefetcher = walk([f"http://x/book/{n}.html" for n in range(1000, 1060, 2)])
+    # 第二章只能等已知链接，之后每章都在按步长猜出的范围里
+    assert prefetcher.misses == 1
+    assert prefetcher.hits == 28
@@ -0,0 +1,34 @@
+import asyncio
+import os
+import bench_site
+import novel_core
+from chapter_index import ChapterReader, index_path
+from novel_update import load_meta, meta_path
+
+
+def crawl(output_file, **kwargs):
+    return asyncio.run(novel_core.crawl_book(
+        bench_site.BOOK_NAME, "", output_file, lambda msg: None, journal_path="journal.db", parse_workers=0, **kwargs))
+
+
+def test_interrupted_redownload_then_update(site, tmp_path):
+    output_file = str(tmp_path / "book.txt")
+    ok, _ = crawl(output_file)
+    assert ok
+    assert load_meta(output_file)["last_index"] == site.chapters
+
+    # 整本重新下载，第一章写入之前就停下：旧的 meta 和索引必须跟着清掉
+    ok, _ = crawl(output_file, stop_flag=lambda: True)
+    assert not ok
+    assert os.path.getsize(output_file) == 0
+    assert not os.path.exists(meta_path(output_file))
+    # 索引要么被删掉，要么是这次新建的空索引，不能留着旧文件的偏移
+    assert not os.path.exists(index_path(output_file)) or ChapterReader(output_file).numbers() == []
+
+    # 增量更新应当从第一章补起，而不是按旧 meta 认为已是最新
+    ok, message = crawl(output_file, update=True)
+    assert ok, message
+    reader = ChapterReader(output_file)
+    assert reader.numbers() == list(range(1, site.chapters + 1))
+    assert reader.chapter(site.chapters)[0].endswith(f"基准章节{site.chapters}")
+    assert load_meta(output_file)["last_index"] == site.chapters
@@ -3,9 +3,12 @@ from lxml import html
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 import concurrent.futures
-import time
-import random
 import csv
+import shared_modules  # 共用小说爬取器里的限速、重试和指标模块
+from rate_limiter import rate_limiter
+import metrics
+from metrics import PARSE_SECONDS, track_request
+from retry_policy import RetryPolicy, classify, retry_stats
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -13,42 +16,57 @@ HEADERS = {
                   "Chrome/114.0.0.0 Safari/537.36"
 }
 
+# 所有请求（详情页 + Selenium 列表页）共用按站点的令牌桶，代替原来零散的 sleep
+rate_limiter.configure("ssr1.scrape.center", rate=5, burst=5)
 
-def get_detail_info(detail_url, retries=1):
-    for attempt in range(retries + 1):
-        try:
-            resp = requests.get(detail_url, headers=HEADERS, timeout=10)
-            resp.raise_for_status()
-            tree = html.fromstring(resp.text)
+# 详情页的重试策略：最多 3 次，单个 URL 总时限 30 秒
+DETAIL_RETRY = RetryPolicy(attempts=3, deadline=30.0)
+
+
+def parse_detail(page_html, detail_url):
+    """解析详情页，返回 (标题, 评分, 简介, 地点, 时长, 上映时间, 链接)"""
+    tree = html.fromstring(page_html)
+
+    # 电影名称
+    title = tree.xpath('//h2[@class="m-b-sm"]/text()')
+    title_text = title[0].strip() if title else "无标题"
+
+    # 评分
+    score = tree.xpath('//p[contains(@class,"score")]/text()')
+    score_text = score[0].strip() if score else "无评分"
 
-            # 电影名称
-            title = tree.xpath('//h2[@class="m-b-sm"]/text()')
-            title_text = title[0].strip() if title else "无标题"
+    # 剧情简介
+    plot = tree.xpath('//div[contains(@class,"drama")]/p/text()')
+    plot_text = plot[0].strip() if plot else "无剧情简介"
 
-            # 评分
-            score = tree.xpath('//p[contains(@class,"score")]/text()')
-            score_text = score[0].strip() if score else "无评分"
+    # 其他信息：地点、时长、上映时间
+    area = tree.xpath('//div[@class="m-v-sm info"][1]/span[1]/text()')
+    area_text = area[0].strip() if area else "无地点"
 
-            # 剧情简介
-            plot = tree.xpath('//div[contains(@class,"drama")]/p/text()')
-            plot_text = plot[0].strip() if plot else "无剧情简介"
+    duration = tree.xpath('//div[@class="m-v-sm info"][1]/span[3]/text()')
+    duration_text = duration[0].strip() if duration else "无时长"
 
-            # 其他信息：地点、时长、上映时间
-            area = tree.xpath('//div[@class="m-v-sm info"][1]/span[1]/text()')
-            area_text = area[0].strip() if area else "无地点"
+    release = tree.xpath('//div[@class="m-v-sm info"][2]/span[1]/text()')
+    release_text = release[0].strip() if release else "无上映时间"
 
-            duration = tree.xpath('//div[@class="m-v-sm info"][1]/span[3]/text()')
-            duration_text = duration[0].strip() if duration else "无时长"
+    return (title_text, score_text, plot_text, area_text, duration_text, release_text, detail_url)
 
-            release = tree.xpath('//div[@class="m-v-sm info"][2]/span[1]/text()')
-            release_text = release[0].strip() if release else "无上映时间"
 
-            return (title_text, score_text, plot_text, area_text, duration_text, release_text, detail_url)
-        except Exception as e:
-            if attempt < retries:
-                time.sleep(1)
-            else:
-                return ("请求失败", "请求失败", f"请求失败: {e}", "请求失败", "请求失败", "请求失败", detail_url)
+def get_detail_info(detail_url, policy=DETAIL_RETRY):
+    def fetch():
+        rate_limiter.acquire(detail_url)
+        with track_request(detail_url, classify) as tracked:
+            resp = requests.get(detail_url, headers=HEADERS, timeout=10)
+            resp.raise_for_status()
+            tracked.bytes = len(resp.content)
+        with PARSE_SECONDS.time(page="detail"):
+            return parse_detail(resp.text, detail_url)
+
+    # 429/5xx/超时按指数退避重试（遵守 Retry-After），404 之类的错误直接放弃
+    try:
+        return policy.run(fetch, url=detail_url)
+    except Exception as e:
+        return ("请求失败", "请求失败", f"请求失败: {e}", "请求失败", "请求失败", "请求失败", detail_url)
 
 
 def clean_text(text):
@@ -79,8 +97,9 @@ def main():
         for page in range(1, max_pages + 1):
             url = f"{base_url}/page/{page}"
             print(f"正在爬取第 {page} 页: {url}")
-            driver.get(url)
-            time.sleep(random.uniform(0.1, 2))
+            rate_limiter.acquire(url)
+            with track_request(url):
+                driver.get(url)
 
             tree = html.fromstring(driver.page_source)
             movie_cards = tree.xpath('//div[@class="el-card__body"]/div[@class="el-row"]')
@@ -132,7 +151,10 @@ def main():
                 print(f"[{i}/{len(movie_details)}] 电影: {origin_title} 抓取失败: {e}")
                 results.append((origin_title, "抓取失败", "抓取失败", "抓取失败", "抓取失败", url, "抓取失败"))
 
-            time.sleep(random.uniform(0.1, 0.5))
+    print(rate_limiter.summary())
+    print(retry_stats.summary())
+    print(metrics.summary())
+    metrics.registry.write_json()
 
     # 保存CSV
     csv_file = "movies_detailed.csv"
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# ---------- 与小说爬取器共用的模块 ----------
+# 限速（rate_limiter）、重试（retry_policy）和指标（metrics）只在 小说爬取器/源代码 里保留一份，
+# 电影爬取器的脚本先 import 本模块把那个目录加进搜索路径，再照常 import，两边不会各改各的
+
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "小说爬取器", "源代码")
+
+if SHARED_DIR not in sys.path:
+    # 放在最后：本目录里同名的脚本（1.py、2.py）仍然优先
+    sys.path.append(SHARED_DIR)
@@ -1,7 +1,6 @@
 import sys
 import os
 import threading
-import time
 import random
 import pandas as pd
 import numpy as np
@@ -12,6 +11,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, pyqtSignal, QObject
 from PyQt6.QtGui import QIcon, QAction,QTextCursor
+import shared_modules  # 共用小说爬取器里的限速、重试和指标模块
+from rate_limiter import rate_limiter
 
 import matplotlib
 matplotlib.use('QtAgg')  # 改为 Qt6 兼容的后端
@@ -49,6 +50,10 @@ def init_driver():
         return None
     return driver
 
+# 携程景点列表页按站点限速（每秒 2 页），代替原来的随机 sleep
+rate_limiter.configure("you.ctrip.com", rate=2, burst=1)
+
+
 def scrape_sight_data(max_pages=10, signals=None):
     driver = init_driver()
     if driver is None:
@@ -61,8 +66,8 @@ def scrape_sight_data(max_pages=10, signals=None):
     for page in range(1, max_pages + 1):
         url = f"https://you.ctrip.com/sightlist/china110000/s0-p{page}.html"
         try:
+            rate_limiter.acquire(url)
             driver.get(url)
-            time.sleep(random.uniform(0.1, 0.5))
         except Exception as e:
             if signals:
                 signals.message.emit(f"⚠️ 第{page}页加载失败: {e}")
@@ -96,6 +101,7 @@ def scrape_sight_data(max_pages=10, signals=None):
     driver.quit()
     result_df = pd.DataFrame(data)
     if signals:
+        signals.message.emit(rate_limiter.summary())
         signals.finished.emit(result_df)
     return result_df
 
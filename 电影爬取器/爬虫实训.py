@@ -1,4 +1,3 @@
-import time
 import random
 import pandas as pd
 import numpy as np
@@ -7,6 +6,8 @@ from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException, WebDriverException
+import shared_modules  # 共用小说爬取器里的限速、重试和指标模块
+from rate_limiter import rate_limiter
 
 
 # 解决 matplotlib 中文显示问题
@@ -39,6 +40,10 @@ from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeEl
 
 from tqdm import tqdm  # 添加 tqdm 进度条
 
+# 携程景点列表页按站点限速（每秒 2 页），代替原来的随机 sleep
+rate_limiter.configure("you.ctrip.com", rate=2, burst=1)
+
+
 def scrape_sight_data(max_pages=10):
     driver = init_driver()
     if driver is None:
@@ -50,8 +55,8 @@ def scrape_sight_data(max_pages=10):
     for page in tqdm(range(1, max_pages + 1), desc="📡 正在爬取", unit="页", ncols=80):
         url = f"https://you.ctrip.com/sightlist/china110000/s0-p{page}.html"
         try:
+            rate_limiter.acquire(url)  # 按站点限速，代替随机延迟
             driver.get(url)
-            time.sleep(random.uniform(0.1, 0.5))  # 模拟反爬机制延迟
         except Exception as e:
             print(f"⚠️ 第 {page} 页加载失败: {e}")
             break
@@ -86,6 +91,7 @@ def scrape_sight_data(max_pages=10):
                 continue
 
     driver.quit()
+    print(rate_limiter.summary())
     return pd.DataFrame(data)
 
 